@@ -3,21 +3,19 @@ LangGraph-based business consulting agent.
 Coordinates LLM reasoning and tool usage.
 """
 
+import asyncio
 from typing import TypedDict, Sequence, Annotated, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import BaseMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-from core.config import OPENAI_API_KEY
+from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage
+from core.config import TOOL_CONCURRENCY
+from core.providers import build_chat_model
+from core.sessions import window_history
 from agents.tools import tools
 
-# LLM bound to tool definitions
-llm = ChatOpenAI(
-    model="gpt-4o",
-    temperature=0.0,
-    openai_api_key=OPENAI_API_KEY
-).bind_tools(tools)
+# LLM of the configured provider bound to tool definitions
+llm = build_chat_model(model="gpt-4o", temperature=0.0).bind_tools(tools)
 
 class AgentState(TypedDict):
     """
@@ -25,17 +23,46 @@ class AgentState(TypedDict):
     """
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
-def agent(state: AgentState):
+async def agent(state: AgentState):
     """
     Main agent logic node.
     """
-    response = llm.invoke([
+    # Only the recent turns of the conversation are sent to the LLM
+    history = window_history(state["messages"])
+
+    response = await llm.ainvoke([
         SystemMessage(
             content="You are a helpful business consulting agent."
         ),
-        *state["messages"]
+        *history
     ])
-    return {"messages": [response]}
+
+    # Older messages will never be sent again: drop them from the thread
+    # so the checkpointed conversation stays bounded
+    dropped = state["messages"][:len(state["messages"]) - len(history)]
+    return {"messages": [RemoveMessage(id=m.id) for m in dropped] + [response]}
+
+class ConcurrentToolNode(ToolNode):
+    """
+    ToolNode that runs the independent tool calls of one agent step
+    concurrently, at most ``max_concurrency`` at a time (taken from the
+    run config, else TOOL_CONCURRENCY).
+    """
+
+    def __init__(self, tools, max_concurrency: int = TOOL_CONCURRENCY, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency
+
+    async def _afunc(self, input, config, *, store):
+        tool_calls, input_type = self._parse_input(input, store)
+        semaphore = asyncio.Semaphore(config.get("max_concurrency") or self.max_concurrency)
+
+        async def run_one(call):
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        outputs = await asyncio.gather(*(run_one(call) for call in tool_calls))
+        return self._combine_tool_outputs(outputs, input_type)
 
 def should_continue(state: AgentState) -> Literal["continue", "end"]:
     """
@@ -43,14 +70,16 @@ def should_continue(state: AgentState) -> Literal["continue", "end"]:
     """
     return "continue" if state["messages"][-1].tool_calls else "end"
 
-def build_agent():
+def build_agent(checkpointer=None):
     """
-    Builds and compiles the LangGraph agent.
+    Builds and compiles the LangGraph agent. With a checkpointer, the
+    conversation of each thread (thread_id = session_id) is kept by the
+    graph, so every call only passes the new user message.
     """
     graph = StateGraph(AgentState)
 
     graph.add_node("agent", agent)
-    graph.add_node("tools", ToolNode(tools))
+    graph.add_node("tools", ConcurrentToolNode(tools))
 
     graph.set_entry_point("agent")
 
@@ -62,4 +91,4 @@ def build_agent():
 
     graph.add_edge("tools", "agent")
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
@@ -4,30 +4,46 @@ Each tool is callable by the LLM during reasoning.
 """
 
 from langchain_core.tools import tool
-from core.data_loader import load_business_data
-from rag.retriever import build_policy_retriever
-from typing import Dict
-
-# Load business data once at startup
-business_data = load_business_data()
-
-# Build policy retriever once
-policy_retriever = build_policy_retriever()
+from core.app_context import (
+    aget_policy_answer_cache,
+    aget_policy_retriever,
+    get_business_data,
+    get_business_index,
+    get_customer_metrics,
+    get_leaderboard,
+)
+from typing import Dict, Optional
+
+# Business data, its indexes, the customer metrics and leaderboards, the
+# policy retriever and the answer cache are loaded once per process by the
+# application context (core/app_context.py), at startup or on first use
 
 @tool
-def policy_lookup(question: str) -> str:
+async def policy_lookup(question: str) -> str:
     """
     Answer questions related to company policies.
     """
-    result = policy_retriever.invoke({"query": question})
-    return result["result"]
+    policy_answer_cache = await aget_policy_answer_cache()
+    cached = await policy_answer_cache.alookup(question)
+
+    if cached is None:
+        policy_retriever = await aget_policy_retriever()
+        result = await policy_retriever.ainvoke({"query": question})
+        cached = await policy_answer_cache.aadd(
+            question,
+            result["result"],
+            [doc.page_content for doc in result["source_documents"]],
+        )
+
+    sources = "\n".join(f"- {source}" for source in cached["sources"])
+    return f"{cached['answer']}\n\nSources:\n{sources}"
 
 @tool
 def average_transaction_amount() -> str:
     """
     Returns the average transaction amount in EUR.
     """
-    avg = business_data["transaction_amount_eur"].mean()
+    avg = get_customer_metrics().average_transaction_eur
     return f"The average transaction amount is {avg:.2f} EUR."
 
 @tool
@@ -39,10 +55,11 @@ def get_transaction_field(transaction_id: int, field: str) -> str:
     base_currency, transaction_currency, transaction_timestamp,
     category, country, signup_date, is_high_value_transaction
     """
-    if field not in business_data.columns:
-        return f"Invalid field. Available fields are: {list(business_data.columns)}"
+    columns = get_business_data().columns
+    if field not in columns:
+        return f"Invalid field. Available fields are: {list(columns)}"
 
-    row = business_data.loc[business_data["transaction_id"] == transaction_id]
+    row = get_business_index().transaction(transaction_id)
     if row.empty:
         return "Transaction not found."
 
@@ -53,7 +70,7 @@ def get_customer_transactions(customer_id: int) -> str:
     """
     Get a summary of transactions for a given customer.
     """
-    rows = business_data.loc[business_data["customer_id"] == customer_id]
+    rows = get_business_index().customer(customer_id)
 
     if rows.empty:
         return "No transactions found for this customer."
@@ -73,7 +90,7 @@ def get_transaction_summary(transaction_id: int) -> str:
     """
     Get a human-readable summary of a transaction.
     """
-    row = business_data.loc[business_data["transaction_id"] == transaction_id]
+    row = get_business_index().transaction(transaction_id)
     if row.empty:
         return "Transaction not found."
 
@@ -94,7 +111,7 @@ def list_transaction_categories() -> str:
     """
     List all transaction categories.
     """
-    categories = sorted(business_data["category"].dropna().unique())
+    categories = sorted(get_business_data()["category"].dropna().unique())
     return "Transaction categories: " + ", ".join(categories)
 
 @tool
@@ -102,17 +119,11 @@ def get_customer_spending_by_category(customer_id: int) -> str:
     """
     Get spending breakdown by category for a customer.
     """
-    rows = business_data.loc[business_data["customer_id"] == customer_id]
+    summary = get_customer_metrics().spending_by_category(customer_id)
 
-    if rows.empty:
+    if summary.empty:
         return "No transactions found."
 
-    summary = (
-        rows.groupby("category")["transaction_amount_eur"]
-        .sum()
-        .sort_values(ascending=False)
-    )
-
     return summary.to_string()
 
 
@@ -121,7 +132,7 @@ def list_supported_countries() -> str:
     """
     List all countries where transactions have occurred.
     """
-    countries = sorted(business_data["country"].dropna().unique())
+    countries = sorted(get_business_data()["country"].dropna().unique())
     return "Supported countries: " + ", ".join(countries)
 
 @tool
@@ -129,7 +140,7 @@ def check_high_value_transaction(transaction_id: int, threshold_eur: float = 500
     """
     Check if transaction exceeds a EUR threshold.
     """
-    row = business_data.loc[business_data["transaction_id"] == transaction_id]
+    row = get_business_index().transaction(transaction_id)
     if row.empty:
         return "Transaction not found."
 
@@ -146,7 +157,7 @@ def check_cross_border(transaction_id: int) -> str:
     """
     Check if a transaction is cross-border.
     """
-    row = business_data.loc[business_data["transaction_id"] == transaction_id]
+    row = get_business_index().transaction(transaction_id)
     if row.empty:
         return "Transaction not found."
 
@@ -162,7 +173,7 @@ def list_supported_currencies() -> str:
     """
     List all supported currencies in the system.
     """
-    currencies = sorted(business_data["transaction_currency"].dropna().unique())
+    currencies = sorted(get_business_data()["transaction_currency"].dropna().unique())
     return "Supported currencies: " + ", ".join(currencies)
 
 @tool
@@ -170,7 +181,7 @@ def get_recent_transactions(customer_id: int, limit: int = 5) -> str:
     """
     Get recent transactions for a customer.
     """
-    rows = business_data.loc[business_data["customer_id"] == customer_id]
+    rows = get_business_index().customer(customer_id)
 
     if rows.empty:
         return "No transactions found."
@@ -190,7 +201,7 @@ def get_customer_profile(customer_id: int) -> str:
     """
     Get customer profile and activity summary.
     """
-    rows = business_data.loc[business_data["customer_id"] == customer_id]
+    rows = get_business_index().customer(customer_id)
     if rows.empty:
         return "Customer not found."
 
@@ -208,16 +219,13 @@ def high_value_by_spend() -> Dict:
     """
     Returns the top 5 customers with the highest total spend.
     """
-    stats = business_data.groupby("customer_id").agg(
-        transaction_count=("transaction_id", "count"),
-        total_spend=("transaction_amount_eur", "sum")
-    ).reset_index()
-
     # Top 5 customers by spend
-    top_customers = stats.sort_values("total_spend", ascending=False).head(5)
-    
+    top_customers = get_leaderboard().top("spend", 5)
+
     return {
-        "high_value_by_spend": top_customers[["customer_id", "total_spend"]].to_dict(orient="records")
+        "high_value_by_spend": [
+            {"customer_id": c["customer_id"], "total_spend": c["total_spend"]} for c in top_customers
+        ]
     }
 
 @tool
@@ -225,12 +233,13 @@ def platform_statistics() -> str:
     """
     Get high-level platform statistics.
     """
+    metrics = get_customer_metrics()
     return (
         f"Platform statistics:\n"
-        f"- Total transactions: {len(business_data)}\n"
-        f"- Total customers: {business_data['customer_id'].nunique()}\n"
-        f"- Average amount (EUR): {business_data['transaction_amount_eur'].mean():.2f}\n"
-        f"- Countries served: {business_data['country'].nunique()}"
+        f"- Total transactions: {metrics.transaction_count}\n"
+        f"- Total customers: {metrics.customer_count}\n"
+        f"- Average amount (EUR): {metrics.average_transaction_eur:.2f}\n"
+        f"- Countries served: {get_business_data()['country'].nunique()}"
     )
 
 @tool
@@ -238,16 +247,48 @@ def high_value_by_frequency() -> Dict:
     """
     Returns the top 5 customers with the highest number of transactions.
     """
-    stats = business_data.groupby("customer_id").agg(
-        transaction_count=("transaction_id", "count"),
-        total_spend=("transaction_amount_eur", "sum")
-    ).reset_index()
-
     # Top 5 customers by transaction count
-    top_customers = stats.sort_values("transaction_count", ascending=False).head(5)
-    
+    top_customers = get_leaderboard().top("frequency", 5)
+
+    return {
+        "high_value_by_frequency": [
+            {"customer_id": c["customer_id"], "transaction_count": c["transaction_count"]} for c in top_customers
+        ]
+    }
+
+@tool
+def customer_leaderboard(
+    metric: str = "spend",
+    n: int = 5,
+    dimension: str = "overall",
+    dimension_value: Optional[str] = None,
+    period: str = "all",
+) -> Dict:
+    """
+    Top n customers by a metric, overall or per country/category, over a period.
+    metric: spend (total EUR), frequency (number of transactions) or
+    average_basket (average EUR per transaction).
+    dimension: overall, country or category. dimension_value selects one
+    country or category; when empty, every value gets its own leaderboard.
+    period: all, a year (YYYY) or a month (YYYY-MM).
+    """
+    leaderboard = get_leaderboard()
+    try:
+        if dimension == "overall" or dimension_value:
+            boards = {dimension_value or "overall": leaderboard.top(metric, n, dimension, dimension_value, period)}
+        else:
+            boards = {
+                value: leaderboard.top(metric, n, dimension, value, period)
+                for value in leaderboard.values(dimension, period)
+            }
+    except ValueError as error:
+        return str(error)
+
     return {
-        "high_value_by_frequency": top_customers[["customer_id", "transaction_count"]].to_dict(orient="records")
+        "metric": metric,
+        "dimension": dimension,
+        "period": period,
+        "leaderboards": boards,
     }
 
 
@@ -261,5 +302,6 @@ tools = [
     get_customer_spending_by_category,
     list_supported_countries,
     check_high_value_transaction,
-    check_cross_border
+    check_cross_border,
+    customer_leaderboard
 ]
\ No newline at end of file
@@ -3,43 +3,63 @@ Chat API endpoint.
 Manages session memory and agent invocation.
 """
 
+import json
+from contextlib import asynccontextmanager
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from uuid import uuid4
 from langchain_core.messages import HumanMessage
 from schemas.chat import ChatRequest, ChatResponse
 from agents.business_agent import build_agent
+from core.app_context import app_context
+from core.config import TOOL_CONCURRENCY
+from core.sessions import open_checkpointer
+from core.tracing import trace_callbacks
 
-router = APIRouter()
+# Compiled agent, with the conversation checkpointer opened at startup
+agent_app = None
 
-# Compile agent once at startup
-agent_app = build_agent()
 
-# In-memory conversation store (session-based)
-conversation_store = {}
+@asynccontextmanager
+async def lifespan(app):
+    global agent_app
+    async with open_checkpointer() as checkpointer:
+        # Compile agent once at startup
+        agent_app = build_agent(checkpointer)
+        app_context.provide("agent", agent_app)
+        yield
+
+
+router = APIRouter(lifespan=lifespan)
+
+
+def _run_config(session_id: str) -> dict:
+    # The session's conversation is the checkpointer thread; tool calls of
+    # one step run concurrently up to the limit; nodes, tools, retrievals
+    # and LLM calls are recorded in the request's trace
+    return {
+        "configurable": {"thread_id": session_id},
+        "max_concurrency": TOOL_CONCURRENCY,
+        "callbacks": trace_callbacks(),
+    }
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     try:
         # Create or reuse session
         session_id = request.session_id or str(uuid4())
-        conversation_store.setdefault(session_id, [])
-
-        # Append user message to history
-        conversation_store[session_id].append(
-            HumanMessage(content=request.message)
-        )
 
-        # Invoke agent with full conversation
-        result = agent_app.invoke(
-            {"messages": conversation_store[session_id]}
+        # Invoke agent with the new user message only: the checkpointer adds
+        # it to the session's history and stores the turn once it completes
+        result = await agent_app.ainvoke(
+            {"messages": [HumanMessage(content=request.message)]},
+            config=_run_config(session_id),
+            checkpoint_during=False,
         )
 
         # Extract AI response
         ai_message = result["messages"][-1]
 
-        # Store AI response
-        conversation_store[session_id].append(ai_message)
-
         return ChatResponse(
             response=ai_message.content,
             session_id=session_id
@@ -47,3 +67,66 @@ def chat(request: ChatRequest):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(event: str, data: dict) -> str:
+    # One server-sent event
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Same conversation as /chat, streamed as server-sent events:
+    session (session id), token (answer text as it is generated),
+    tool_start / tool_end (tool-call progress), done (final answer)
+    and error.
+    """
+
+    # Create or reuse session
+    session_id = request.session_id or str(uuid4())
+
+    async def events():
+        yield _sse("session", {"session_id": session_id})
+
+        try:
+            result = None
+            async for event in agent_app.astream_events(
+                {"messages": [HumanMessage(content=request.message)]},
+                config=_run_config(session_id),
+                version="v2",
+                checkpoint_during=False,
+            ):
+                kind = event["event"]
+
+                # Tokens of the agent's own replies (not of LLM calls made
+                # inside tools, e.g. the policy RetrievalQA chain)
+                if kind == "on_chat_model_stream":
+                    if event["metadata"].get("langgraph_node") != "agent":
+                        continue
+                    content = event["data"]["chunk"].content
+                    if content:
+                        yield _sse("token", {"content": content})
+
+                elif kind == "on_tool_start":
+                    yield _sse("tool_start", {"name": event["name"], "input": event["data"].get("input")})
+
+                elif kind == "on_tool_end":
+                    yield _sse("tool_end", {"name": event["name"]})
+
+                # Final graph state
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    result = event["data"]["output"]
+
+            ai_message = result["messages"][-1]
+
+            yield _sse("done", {"response": ai_message.content, "session_id": session_id})
+
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,30 @@
+"""
+Health endpoints.
+/healthz (liveness): the process is up and serving.
+/readyz (readiness): the agent is compiled and the business data and policy
+index are loaded (unless APP_CONTEXT_LOADING=lazy); 503 with the state of
+each component until then, or when one failed to load.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from core.app_context import app_context
+from core.config import APP_CONTEXT_LOADING
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    # Lazily loaded components are loaded by the first request using them
+    required = ["agent"] if APP_CONTEXT_LOADING == "lazy" else [*app_context.loaders, "agent"]
+    ready = app_context.ready(required)
+    return JSONResponse(
+        {"status": "ready" if ready else "not ready", "components": app_context.status()},
+        status_code=200 if ready else 503,
+    )
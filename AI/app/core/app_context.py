@@ -0,0 +1,158 @@
+"""
+Application context: data and models shared by the agent tools.
+
+Responsibilities:
+- Load each component (business data and its indexes, customer metrics,
+  leaderboards, policy retriever, answer cache) once per process, on first
+  use or in a background warm-up, instead of at import time
+- Getters for the tools, which wait for a component still being loaded
+- Readiness: which components are loaded, loading or failed (/readyz)
+- Sharing across workers: with APP_CONTEXT_LOADING=preload everything is
+  loaded at import, so workers forked from a gunicorn --preload master
+  share that copy; components holding network clients or SQLite
+  connections are reloaded in each worker (from the saved index and
+  embedding cache)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict
+from core.data_loader import BusinessDataIndex, load_business_data, load_customer_metrics
+from core.leaderboard import build_leaderboard
+from rag.answer_cache import SemanticAnswerCache
+from rag.retriever import build_policy_retriever
+from rag.vectorstore import policy_corpus_hash
+
+logger = logging.getLogger(__name__)
+
+# Component name -> loader taking the context (for its dependencies), in load order
+LOADERS: Dict[str, Callable[["AppContext"], Any]] = {
+    "business_data": lambda context: load_business_data(),
+    "business_index": lambda context: BusinessDataIndex(context.get("business_data")),
+    "customer_metrics": lambda context: load_customer_metrics(),
+    "leaderboard": lambda context: build_leaderboard(context.get("business_data")),
+    "policy_retriever": lambda context: build_policy_retriever(),
+    "policy_answer_cache": lambda context: SemanticAnswerCache(
+        context.get("policy_retriever").retriever.vectorstore.embeddings,
+        corpus_hash=policy_corpus_hash(),
+    ),
+}
+
+# Components that must not be shared with forked workers (HTTP clients,
+# SQLite connections): dropped after a fork and loaded again in the worker
+PER_PROCESS_COMPONENTS = ("policy_retriever", "policy_answer_cache")
+
+
+class AppContext:
+    """
+    Components by name, loaded at most once: concurrent getters of a
+    component being loaded wait for it. Components without a loader (the
+    compiled agent) are provided by the application at startup.
+    """
+
+    def __init__(self, loaders=LOADERS):
+        self.loaders = loaders
+        self._components: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._loading = set()
+        self._locks = {name: threading.Lock() for name in loaders}
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        for name in PER_PROCESS_COMPONENTS:
+            self._components.pop(name, None)
+        self._loading.clear()
+        self._locks = {name: threading.Lock() for name in self.loaders}
+
+    def provide(self, name: str, component) -> None:
+        self._components[name] = component
+
+    def get(self, name: str):
+        """The component, loaded now if it is not loaded yet."""
+        if name in self._components:
+            return self._components[name]
+        if name not in self.loaders:
+            raise RuntimeError(f"Component '{name}' is not available yet")
+
+        with self._locks[name]:
+            if name not in self._components:
+                self._loading.add(name)
+                start = time.perf_counter()
+                try:
+                    self._components[name] = self.loaders[name](self)
+                except Exception as error:
+                    # Not cached: the next get tries again
+                    self._errors[name] = repr(error)
+                    raise
+                finally:
+                    self._loading.discard(name)
+                self._errors.pop(name, None)
+                logger.info(f"Loaded '{name}' in {time.perf_counter() - start:.2f}s")
+
+        return self._components[name]
+
+    async def aget(self, name: str):
+        """Like get, loading in a worker thread so the event loop keeps serving."""
+        if name in self._components:
+            return self._components[name]
+        return await asyncio.to_thread(self.get, name)
+
+    def load_all(self) -> None:
+        for name in self.loaders:
+            self.get(name)
+
+    async def warm_up(self) -> None:
+        """Load every component in worker threads (independent ones concurrently)."""
+
+        async def load(name):
+            try:
+                await self.aget(name)
+            except Exception:
+                logger.exception(f"Failed to load '{name}'")
+
+        await asyncio.gather(*(load(name) for name in self.loaders))
+
+    def status(self) -> Dict[str, str]:
+        """State of every component: ready, loading, pending or the load error."""
+        names = list(self.loaders) + [name for name in self._components if name not in self.loaders]
+        return {
+            name: "ready" if name in self._components
+            else "loading" if name in self._loading
+            else f"error: {self._errors[name]}" if name in self._errors
+            else "pending"
+            for name in names
+        }
+
+    def ready(self, names=None) -> bool:
+        return all(name in self._components for name in (names or self.loaders))
+
+
+# Shared by the whole process
+app_context = AppContext()
+
+
+def get_business_data():
+    return app_context.get("business_data")
+
+
+def get_business_index() -> BusinessDataIndex:
+    return app_context.get("business_index")
+
+
+def get_customer_metrics():
+    return app_context.get("customer_metrics")
+
+
+def get_leaderboard():
+    return app_context.get("leaderboard")
+
+
+async def aget_policy_retriever():
+    return await app_context.aget("policy_retriever")
+
+
+async def aget_policy_answer_cache() -> SemanticAnswerCache:
+    return await app_context.aget("policy_answer_cache")
@@ -4,16 +4,73 @@ Loads environment variables and validates required keys.
 """
 
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load variables from .env into environment
 load_dotenv()
 
+# Model providers (see core/providers.py): "openai", or "local" for the
+# offline stand-ins (hashing embeddings, scripted chat model)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", LLM_PROVIDER)
+
+# Local stand-ins: embedding size, and the scripted chat model's delay before
+# the first token and between streamed tokens (seconds)
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "384"))
+LOCAL_LLM_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", "0"))
+LOCAL_LLM_TOKEN_LATENCY = float(os.getenv("LOCAL_LLM_TOKEN_LATENCY", "0"))
+
 # OpenAI API key required by LangChain / OpenAI SDK
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Fail fast if key is missing
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is missing.")
+# Fail fast if key is missing while an OpenAI provider is selected
+if "openai" in (LLM_PROVIDER, EMBEDDING_PROVIDER):
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is missing.")
+
+    print("OPENAI_API_KEY found.")
+
+# Maximum number of tool calls from one agent step executed at the same time
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+
+# Where conversations are checkpointed: "sqlite" (CHECKPOINT_PATH) or "memory"
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite")
+
+# Sessions kept by the checkpointer (both backends): least recently used
+# sessions are evicted above MAX_SESSIONS, idle ones expire after
+# SESSION_TTL_SECONDS
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+# History sent to the agent: the last HISTORY_MAX_TURNS turns that fit
+# HISTORY_MAX_TOKENS (approximate) tokens
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "10"))
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))
+
+# Requests slower than SLOW_REQUEST_SECONDS are logged with their trace
+# (span per graph node, tool call, retrieval and LLM call); 0 disables it
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "0"))
+
+# How the business data and policy index are loaded (core/app_context.py):
+# "background" (after startup; /readyz reports ready once done), "lazy"
+# (on first use) or "preload" (at import, before serving; with gunicorn
+# --preload the workers share the master's loaded copy)
+APP_CONTEXT_LOADING = os.getenv("APP_CONTEXT_LOADING", "background")
+
+# Saved FAISS index of the policy documents (with its manifest)
+VECTORSTORE_DIR = os.getenv("VECTORSTORE_DIR", str(Path(__file__).resolve().parent.parent / "rag" / "faiss_index"))
+
+# On-disk embedding cache (model + text hash -> vector), least recently
+# used entries evicted above EMBEDDING_CACHE_MAX_ENTRIES
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).resolve().parent.parent / "rag" / "embedding_cache.sqlite"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
 
-print("OPENAI_API_KEY found.")
+# Semantic cache of policy answers: a question reuses the answer of a
+# previous one with cosine similarity >= ANSWER_CACHE_THRESHOLD, for at most
+# ANSWER_CACHE_TTL_SECONDS; cleared when the policy corpus changes
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", str(Path(__file__).resolve().parent.parent / "rag" / "answer_cache.npz"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
@@ -6,33 +6,61 @@ Responsibilities:
 - Apply SCD Type-2 joins
 - Filter valid records
 - Return analytics-ready dataset
+- Index it by transaction and customer for the agent tools
+- Load the per-customer aggregates materialized by the ETL
 """
 
+import sys
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
-def load_business_data():
-    # Resolve project root directory
-    root_dir = Path(__file__).resolve().parent.parent.parent.parent
+# Resolve project root directory and expose the warehouse table reader
+root_dir = Path(__file__).resolve().parent.parent.parent.parent
+sys.path.append(str(root_dir / "data_warehouse"))
 
-    # Load dimension tables
-    dim_categories = pd.read_csv(
-        root_dir / "data_warehouse/processed_data/dim_categories.csv"
-    )
-    dim_customers = pd.read_csv(
-        root_dir / "data_warehouse/processed_data/dim_customers.csv"
+from utils.helper_functions import DATE_PARTITION_COLUMNS, read_table, read_table_range
+
+def load_business_data(start=None, end=None):
+    """
+    Build the analytics-ready dataset. ``start``/``end`` restrict it to the
+    transactions in that time range; only the matching fact partitions are read.
+    """
+
+    # Load dimension tables (only the columns used by the joins below)
+    dim_categories = read_table(
+        "dim_categories",
+        columns=["category_key", "category", "is_refundable", "return_window_days"],
     )
-    dim_dates = pd.read_csv(
-        root_dir / "data_warehouse/processed_data/dim_dates.csv"
+    dim_customers = read_table("dim_customers")
+    dim_dates = read_table(
+        "dim_dates",
+        columns=[
+            "date_key",
+            "date",
+            "transaction_day",
+            "transaction_month",
+            "transaction_year",
+            "transaction_weekday",
+        ],
     )
-    dim_currencies = pd.read_csv(
-        root_dir / "data_warehouse/processed_data/dim_currencies.csv"
+    dim_currencies = read_table(
+        "dim_currencies",
+        columns=[
+            "currency_key",
+            "base_currency",
+            "transaction_currency",
+            "currency_imputed",
+            "conversion_type",
+            "exchange_rate_source",
+        ],
     )
 
     # Load fact table
-    fact_transactions = pd.read_csv(
-        root_dir / "data_warehouse/processed_data/fact_transactions.csv"
-    )
+    fact_transactions = read_table_range("fact_transactions", start=start, end=end)
+
+    # Calendar attributes are taken from dim_dates below
+    fact_transactions = fact_transactions.drop(columns=DATE_PARTITION_COLUMNS)
 
     # Join static dimensions to fact table
     fact = (
@@ -85,19 +113,123 @@ def load_business_data():
     dim_customers["effective_from"] = pd.to_datetime(dim_customers["effective_from"])
     dim_customers["effective_to"] = pd.to_datetime(dim_customers["effective_to"])
 
-    # Join SCD Type-2 customer dimension
-    fact = fact.merge(dim_customers, on="customer_id", how="left")
+    # The fact table carries the customer version valid at the transaction
+    # time, so the SCD Type-2 dimension joins many-to-one on the surrogate key.
+    # Transactions without a valid customer version are left out.
+    fact = fact.merge(
+        dim_customers.drop(columns=["customer_id"]),
+        on="customer_key",
+        how="inner",
+        validate="many_to_one",
+    )
 
     # Handle open-ended SCD records
     fact["effective_to"] = fact["effective_to"].fillna(
         pd.Timestamp("2099-12-31")
     )
 
-    # Filter records valid at transaction date
-    fact = fact[
-        (fact["date"] >= fact["effective_from"]) &
-        (fact["date"] <= fact["effective_to"])
-    ]
     # print(fact.head())
     # Clean duplicated / technical columns
     return fact
+
+
+class BusinessDataIndex:
+    """
+    Hash indexes over the analytics-ready dataset for point lookups.
+
+    Row positions are sorted by key once (stably, so rows keep their dataset
+    order within a key), and a dict maps every key to its start/stop offsets
+    in that array. A lookup is then one dict access plus a slice, O(1) for a
+    transaction and O(k) for a customer with k transactions, instead of a
+    boolean scan over the whole dataset.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        self._transaction_order, self._transaction_offsets = self._build(data["transaction_id"])
+        self._customer_order, self._customer_offsets = self._build(data["customer_id"])
+
+    @staticmethod
+    def _build(keys: pd.Series):
+        # Positions of the non-null keys, sorted by key
+        positions = np.flatnonzero(keys.notna().to_numpy())
+        values = keys.iloc[positions].to_numpy(dtype="int64")
+        if len(values) == 0:
+            return positions, {}
+
+        order = np.argsort(values, kind="stable")
+        sorted_values = values[order]
+
+        # One [start, stop) run per distinct key
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+        stops = np.r_[starts[1:], len(sorted_values)]
+        offsets = dict(zip(sorted_values[starts].tolist(), zip(starts.tolist(), stops.tolist())))
+
+        return positions[order], offsets
+
+    def _rows(self, order, offsets, key) -> pd.DataFrame:
+        try:
+            start, stop = offsets.get(int(key), (0, 0))
+        except (TypeError, ValueError):
+            start, stop = 0, 0
+        return self.data.iloc[order[start:stop]]
+
+    def transaction(self, transaction_id) -> pd.DataFrame:
+        """Rows of a transaction (empty if unknown)."""
+        return self._rows(self._transaction_order, self._transaction_offsets, transaction_id)
+
+    def customer(self, customer_id) -> pd.DataFrame:
+        """Transactions of a customer in dataset order (empty if unknown)."""
+        return self._rows(self._customer_order, self._customer_offsets, customer_id)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class CustomerMetrics:
+    """
+    Per-customer aggregates (agg_customer_metrics) and spend per customer and
+    category (agg_customer_category_spend), as materialized by the ETL.
+
+    Tools read a customer's rows through the customer_id index and platform
+    totals from precomputed sums, instead of grouping the whole dataset on
+    every call.
+    """
+
+    def __init__(self, metrics: pd.DataFrame, category_spend: pd.DataFrame):
+        self.metrics = metrics.set_index("customer_id")
+        self.category_spend = (
+            category_spend
+            .sort_values(["customer_id", "total_spend_eur"], ascending=[True, False], kind="stable")
+            .set_index("customer_id")
+        )
+
+        # Platform totals
+        self.transaction_count = int(self.metrics["transaction_count"].sum())
+        self.total_spend_eur = float(self.metrics["total_spend_eur"].sum())
+        self.customer_count = len(self.metrics)
+
+    @property
+    def average_transaction_eur(self) -> float:
+        return self.total_spend_eur / self.transaction_count if self.transaction_count else float("nan")
+
+    def spending_by_category(self, customer_id) -> pd.Series:
+        """Spend per category of a customer, highest first (empty if unknown)."""
+        try:
+            rows = self.category_spend.loc[[int(customer_id)]]
+        except (KeyError, TypeError, ValueError):
+            rows = self.category_spend.iloc[:0]
+
+        return pd.Series(
+            rows["total_spend_eur"].to_numpy(),
+            index=pd.Index(rows["category"].to_numpy(), name="category"),
+            name="transaction_amount_eur",
+        )
+
+
+def load_customer_metrics() -> CustomerMetrics:
+    """Read the customer aggregate tables written by the ETL."""
+    return CustomerMetrics(
+        read_table("agg_customer_metrics"),
+        read_table("agg_customer_category_spend"),
+    )
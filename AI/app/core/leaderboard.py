@@ -0,0 +1,192 @@
+"""
+Top-N customer leaderboards.
+
+Responsibilities:
+- Keep per-customer transaction count and spend for every leaderboard group
+  (overall, per country, per category; over all time, a year or a month)
+- Serve the top N customers by spend, frequency or average basket with
+  partial selection (heaps) instead of sorting every customer
+- Fold transactions in incrementally (add_transactions); the application
+  only calls it once, from build_leaderboard when the leaderboard component
+  is loaded, so leaderboards reflect the data at app start
+"""
+
+import heapq
+import pandas as pd
+
+# Ranking metrics: spend = total EUR, frequency = number of transactions,
+# average_basket = average EUR per transaction
+METRICS = ("spend", "frequency", "average_basket")
+
+# Groupings (overall or per value of a customer/transaction attribute)
+DIMENSIONS = {
+    "overall": None,
+    "country": "country",
+    "category": "category",
+}
+
+# Metrics that can only grow when transactions are added: their cached top
+# lists are updated in place, the others are recomputed on the next read
+_MONOTONE_METRICS = ("spend", "frequency")
+
+
+def _period_of(year, month) -> list:
+    # Periods a transaction counts towards: all time, its year and its month
+    return ["all", f"{year}", f"{year}-{month:02d}"]
+
+
+class Leaderboard:
+    """
+    Top-N customers per group, where a group is a dimension value (overall,
+    a country or a category) within a period ("all", "YYYY" or "YYYY-MM").
+
+    Every group keeps ``customer_id -> [transaction_count, spend]``. The top
+    ``capacity`` entries per group and metric are cached as a sorted list;
+    spend and frequency caches are patched in place when transactions are
+    added, average basket caches are invalidated and rebuilt lazily.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._groups = {}
+        self._top = {}
+
+    def add_transactions(self, transactions: pd.DataFrame) -> None:
+        """
+        Fold new transactions (analytics dataset rows) into every group.
+
+        Only called by build_leaderboard at app start: no data refresh feeds
+        it, so new transactions show up after a restart.
+        """
+
+        frame = pd.DataFrame({
+            "customer_id": transactions["customer_id"],
+            "amount": transactions["transaction_amount_eur"],
+            "country": transactions["country"],
+            "category": transactions["category"],
+            "year": transactions["transaction_year"],
+            "month": transactions["transaction_month"],
+        }).dropna(subset=["customer_id", "amount", "year", "month"])
+
+        if frame.empty:
+            return
+
+        # Aggregate the batch per customer and finest group first
+        batch = (
+            frame
+            .groupby(["customer_id", "country", "category", "year", "month"], dropna=False)["amount"]
+            .agg(["size", "sum"])
+            .reset_index()
+        )
+
+        for dimension, column in DIMENSIONS.items():
+            keys = ["customer_id", "year", "month"] + ([column] if column else [])
+            per_group = batch.groupby(keys, dropna=False)[["size", "sum"]].sum().reset_index()
+
+            for row in per_group.itertuples(index=False):
+                value = getattr(row, column) if column else None
+                if column and pd.isna(value):
+                    continue
+
+                for period in _period_of(int(row.year), int(row.month)):
+                    self._update(
+                        (dimension, value, period), int(row.customer_id), int(row.size), float(row.sum)
+                    )
+
+    def _update(self, group, customer_id, count, spend) -> None:
+        stats = self._groups.setdefault(group, {})
+        entry = stats.setdefault(customer_id, [0, 0.0])
+        entry[0] += count
+        entry[1] += spend
+
+        for metric in METRICS:
+            cached = self._top.get((group, metric))
+            if cached is None:
+                continue
+            if metric in _MONOTONE_METRICS and spend >= 0:
+                self._patch(cached, metric, customer_id, entry)
+            else:
+                del self._top[(group, metric)]
+
+    @staticmethod
+    def _score(metric, entry) -> float:
+        count, spend = entry
+        if metric == "spend":
+            return spend
+        if metric == "frequency":
+            return count
+        return spend / count
+
+    def _patch(self, cached, metric, customer_id, entry) -> None:
+        # A grown score can only move its customer up, or into a full list
+        score = self._score(metric, entry)
+        for i, (_, cid) in enumerate(cached):
+            if cid == customer_id:
+                del cached[i]
+                break
+        else:
+            if len(cached) >= self.capacity and score < cached[-1][0]:
+                return
+
+        cached.append((score, customer_id))
+        cached.sort(key=lambda item: (-item[0], item[1]))
+        del cached[self.capacity:]
+
+    def _select(self, group, metric, n) -> list:
+        # Partial selection: O(customers * log n) instead of a full sort.
+        # Highest score first, ties broken by the lower customer_id
+        stats = self._groups.get(group, {})
+        ranked = heapq.nsmallest(
+            n,
+            ((-self._score(metric, entry), customer_id) for customer_id, entry in stats.items()),
+        )
+        return [(-score, customer_id) for score, customer_id in ranked]
+
+    def top(self, metric: str = "spend", n: int = 5, dimension: str = "overall", value=None, period: str = "all") -> list:
+        """
+        Top ``n`` customers by ``metric`` in a group, highest first, as
+        ``{"customer_id", "transaction_count", "total_spend", "average_basket"}``
+        records.
+        """
+
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Available metrics: {list(METRICS)}")
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'. Available dimensions: {list(DIMENSIONS)}")
+
+        group = (dimension, None if dimension == "overall" else value, str(period))
+
+        if n > self.capacity:
+            ranked = self._select(group, metric, n)
+        else:
+            if (group, metric) not in self._top:
+                self._top[(group, metric)] = self._select(group, metric, self.capacity)
+            ranked = self._top[(group, metric)][:n]
+
+        stats = self._groups.get(group, {})
+        return [
+            {
+                "customer_id": customer_id,
+                "transaction_count": stats[customer_id][0],
+                "total_spend": stats[customer_id][1],
+                "average_basket": stats[customer_id][1] / stats[customer_id][0],
+            }
+            for _, customer_id in ranked
+        ]
+
+    def values(self, dimension: str, period: str = "all") -> list:
+        """Dimension values that have a leaderboard in ``period``."""
+        return sorted(
+            value for dim, value, group_period in self._groups
+            if dim == dimension and group_period == str(period) and value is not None
+        )
+
+
+def build_leaderboard(business_data: pd.DataFrame, capacity: int = 100) -> Leaderboard:
+    """
+    Leaderboards over the analytics-ready dataset, built once per process
+    when the app context loads them (like the business data itself).
+    """
+    leaderboard = Leaderboard(capacity=capacity)
+    leaderboard.add_transactions(business_data)
+    return leaderboard
@@ -0,0 +1,251 @@
+"""
+Chat model and embedding providers.
+
+Responsibilities:
+- Registry of providers, selected by config (LLM_PROVIDER, EMBEDDING_PROVIDER)
+- "openai": the OpenAI models used in production
+- "local": offline stand-ins for benchmarks and tests, a deterministic
+  hashing embedding model and a scripted chat model with configurable
+  latency that supports tool calling and streaming
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from core.config import (
+    EMBEDDING_PROVIDER,
+    LLM_PROVIDER,
+    LOCAL_EMBEDDING_DIMENSIONS,
+    LOCAL_LLM_LATENCY,
+    LOCAL_LLM_TOKEN_LATENCY,
+    OPENAI_API_KEY,
+)
+
+# Provider name -> factory
+CHAT_PROVIDERS: Dict[str, Callable[..., BaseChatModel]] = {}
+EMBEDDING_PROVIDERS: Dict[str, Callable[[], Embeddings]] = {}
+
+# Provider name -> embedding model name (part of the index and cache keys)
+EMBEDDING_MODELS: Dict[str, str] = {}
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic local embeddings: words and word pairs hashed (blake2b)
+    into signed buckets, L2-normalized. Texts sharing words are similar.
+    """
+
+    def __init__(self, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        words = re.findall(r"\w+", text.lower())
+        vector = np.zeros(self.dimensions)
+
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Offline chat model. Replies come from ``script`` in turn (cycling) when
+    given; otherwise, with tools bound, a new user message is answered by
+    calling the first tool that takes a single string argument, and other
+    turns by replying with the first ``reply_words`` words of the latest
+    tool results, else of the retrieved context in the system prompt (the
+    text after its "-----" separator line, as in RetrievalQA prompts), else
+    of the latest message. ``latency`` delays each reply (the first token),
+    ``token_latency`` each further streamed token.
+    """
+
+    script: List[AIMessage] = []
+    latency: float = LOCAL_LLM_LATENCY
+    token_latency: float = LOCAL_LLM_TOKEN_LATENCY
+    reply_words: int = 60
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _reply(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        self.calls += 1
+        if self.script:
+            return self.script[(self.calls - 1) % len(self.script)].model_copy()
+
+        last = messages[-1]
+        if tools and isinstance(last, HumanMessage):
+            for tool in tools:
+                parameters = tool["function"]["parameters"]
+                properties = parameters.get("properties", {})
+                if len(properties) == 1 and next(iter(properties.values())).get("type") == "string":
+                    return AIMessage(content="", tool_calls=[{
+                        "name": tool["function"]["name"],
+                        "args": {next(iter(properties)): last.content},
+                        "id": f"call_{self.calls}",
+                    }])
+
+        # Reply from the latest tool results, the retrieved context or the
+        # latest message
+        results = []
+        for message in reversed(messages):
+            if not isinstance(message, ToolMessage):
+                break
+            results.insert(0, str(message.content))
+
+        context = [
+            re.split(r"\n-{4,}\n", str(message.content))[-1]
+            for message in messages
+            if isinstance(message, SystemMessage) and re.search(r"\n-{4,}\n", str(message.content))
+        ]
+        source = " ".join(results or context[-1:] or [str(last.content)])
+
+        return AIMessage(content=" ".join(source.split()[:self.reply_words]))
+
+    def _with_usage(self, messages: List[BaseMessage], reply: AIMessage) -> AIMessage:
+        # Approximate token counts, as reported by the OpenAI models
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([reply])
+        reply.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        reply.response_metadata["model_name"] = self._llm_type
+        return reply
+
+    @staticmethod
+    def _chunks(reply: AIMessage):
+        if reply.tool_calls:
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ])
+            return
+        words = reply.content.split(" ")
+        for i, word in enumerate(words):
+            yield AIMessageChunk(content=word if i == len(words) - 1 else word + " ")
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        reply = self._with_usage(messages, self._reply(messages, tools))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        reply = self._with_usage(messages, self._reply(messages, tools))
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _stream(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any):
+        time.sleep(self.latency)
+        reply = self._with_usage(messages, self._reply(messages, tools))
+        for i, chunk in enumerate(self._chunks(reply)):
+            if i:
+                time.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=reply.usage_metadata, response_metadata=reply.response_metadata
+        ))
+
+    async def _astream(self, messages, stop=None, run_manager=None, tools=None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        reply = self._with_usage(messages, self._reply(messages, tools))
+        for i, chunk in enumerate(self._chunks(reply)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=reply.usage_metadata, response_metadata=reply.response_metadata
+        ))
+
+
+def register_chat_provider(name: str):
+    def register(factory):
+        CHAT_PROVIDERS[name] = factory
+        return factory
+    return register
+
+
+def register_embedding_provider(name: str, model: str):
+    def register(factory):
+        EMBEDDING_PROVIDERS[name] = factory
+        EMBEDDING_MODELS[name] = model
+        return factory
+    return register
+
+
+@register_chat_provider("openai")
+def _openai_chat(model: str = "gpt-4o", temperature: float = 0.0) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    # Streamed replies also report their token usage (for the request traces)
+    return ChatOpenAI(model=model, temperature=temperature, openai_api_key=OPENAI_API_KEY, stream_usage=True)
+
+
+@register_chat_provider("local")
+def _local_chat(**kwargs) -> BaseChatModel:
+    # Model settings of the real provider do not apply
+    return ScriptedChatModel()
+
+
+@register_embedding_provider("openai", "text-embedding-3-small")
+def _openai_embeddings() -> Embeddings:
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(model=EMBEDDING_MODELS["openai"], openai_api_key=OPENAI_API_KEY)
+
+
+@register_embedding_provider("local", f"hashing-{LOCAL_EMBEDDING_DIMENSIONS}")
+def _local_embeddings() -> Embeddings:
+    return HashingEmbeddings()
+
+
+def build_chat_model(provider: str = LLM_PROVIDER, **kwargs) -> BaseChatModel:
+    """Chat model of the configured provider."""
+    if provider not in CHAT_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}'. Available providers: {list(CHAT_PROVIDERS)}")
+    return CHAT_PROVIDERS[provider](**kwargs)
+
+
+def build_embedding_model(provider: str = EMBEDDING_PROVIDER) -> Embeddings:
+    """Embedding model of the configured provider."""
+    if provider not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{provider}'. Available providers: {list(EMBEDDING_PROVIDERS)}")
+    return EMBEDDING_PROVIDERS[provider]()
+
+
+def embedding_model_name(provider: str = EMBEDDING_PROVIDER) -> str:
+    """Name of the provider's embedding model."""
+    if provider not in EMBEDDING_MODELS:
+        raise ValueError(f"Unknown embedding provider '{provider}'. Available providers: {list(EMBEDDING_MODELS)}")
+    return EMBEDDING_MODELS[provider]
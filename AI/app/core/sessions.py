@@ -0,0 +1,185 @@
+"""
+Conversation session storage.
+
+Responsibilities:
+- Provide the LangGraph checkpointer that stores each session's
+  conversation (a thread keyed by session_id): SQLite on disk by default,
+  or process memory. Both are bounded by a maximum number of sessions
+  (least recently used evicted first) and an idle time-to-live, and the
+  SQLite one only keeps the latest checkpoint of each session
+- Window the history sent to the agent to the last N turns that fit a
+  token budget
+"""
+
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from core.config import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_PATH,
+    HISTORY_MAX_TOKENS,
+    HISTORY_MAX_TURNS,
+    MAX_SESSIONS,
+    SESSION_TTL_SECONDS,
+)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    Process-local checkpointer. Threads are kept in least recently used
+    order: threads idle longer than ``ttl_seconds`` expire, and the least
+    recently used one is evicted once there are more than ``max_sessions``.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, ttl_seconds: Optional[float] = SESSION_TTL_SECONDS):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._last_access = OrderedDict()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        self._last_access.pop(thread_id, None)
+        self._last_access[thread_id] = time.monotonic()
+
+        # Threads are ordered by last write, so expired ones are at the front
+        cutoff = time.monotonic() - self.ttl_seconds if self.ttl_seconds else None
+        while self._last_access:
+            oldest, last_access = next(iter(self._last_access.items()))
+            if len(self._last_access) <= self.max_sessions and (cutoff is None or last_access > cutoff):
+                break
+            del self._last_access[oldest]
+            self.delete_thread(oldest)
+
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+class BoundedSqliteSaver(AsyncSqliteSaver):
+    """
+    SQLite checkpointer with the bounds of BoundedMemorySaver. A session's
+    last write is recorded in a sessions table of the same database, so the
+    workers sharing the file enforce ``max_sessions`` and ``ttl_seconds``
+    together.
+
+    Storage model: saving a checkpoint deletes the thread's older ones and
+    their pending writes, so a session holds one checkpoint, its windowed
+    conversation (see window_history), instead of one per turn.
+    """
+
+    def __init__(
+        self,
+        conn,
+        *,
+        max_sessions: int = MAX_SESSIONS,
+        ttl_seconds: Optional[float] = SESSION_TTL_SECONDS,
+        **kwargs,
+    ):
+        super().__init__(conn, **kwargs)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions_ready = False
+
+    async def setup(self) -> None:
+        await super().setup()
+        if self._sessions_ready:
+            return
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    thread_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+                """
+            )
+            # Threads saved before the table existed start their TTL now
+            await self.conn.execute(
+                "INSERT OR IGNORE INTO sessions (thread_id, last_access) SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+            await self.conn.commit()
+        self._sessions_ready = True
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(next_config["configurable"]["thread_id"])
+        checkpoint_ns = next_config["configurable"]["checkpoint_ns"]
+        checkpoint_id = next_config["configurable"]["checkpoint_id"]
+        now = time.time()
+
+        async with self.lock, self.conn.cursor() as cur:
+            # Checkpoint ids sort by time: drop the superseded ones of the thread
+            for table in ("checkpoints", "writes"):
+                await cur.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+            await cur.execute(
+                "INSERT INTO sessions (thread_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET last_access = excluded.last_access",
+                (thread_id, now),
+            )
+
+            # Sessions idle longer than the TTL, then the least recently used
+            # ones beyond max_sessions
+            evicted = set()
+            if self.ttl_seconds:
+                await cur.execute("SELECT thread_id FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+                evicted.update(row[0] for row in await cur.fetchall())
+            await cur.execute(
+                "SELECT thread_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,),
+            )
+            evicted.update(row[0] for row in await cur.fetchall())
+
+            for table in ("checkpoints", "writes", "sessions"):
+                await cur.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(evicted_id,) for evicted_id in evicted])
+            await self.conn.commit()
+
+        return next_config
+
+
+@asynccontextmanager
+async def open_checkpointer(backend: str = CHECKPOINT_BACKEND, path: str = CHECKPOINT_PATH):
+    """
+    Checkpointer for the agent, open for the lifetime of the context:
+    "sqlite" (conversations in a SQLite file, shared by the workers on a
+    host and kept across restarts) or "memory" (this process only). Both
+    evict sessions beyond MAX_SESSIONS and after SESSION_TTL_SECONDS idle.
+    """
+
+    if backend == "memory":
+        yield BoundedMemorySaver()
+    elif backend == "sqlite":
+        async with BoundedSqliteSaver.from_conn_string(path) as checkpointer:
+            await checkpointer.setup()
+            yield checkpointer
+    else:
+        raise ValueError(f"Unknown checkpoint backend '{backend}'. Available backends: ['sqlite', 'memory']")
+
+
+def window_history(
+    messages: List[BaseMessage],
+    max_turns: Optional[int] = HISTORY_MAX_TURNS,
+    max_tokens: Optional[int] = HISTORY_MAX_TOKENS,
+) -> List[BaseMessage]:
+    """
+    The most recent whole turns of a conversation (a turn starts with a user
+    message): at most ``max_turns``, dropping older ones until the window
+    fits ``max_tokens`` (approximate count). The latest turn is always kept.
+    """
+
+    starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)] or [0]
+    if max_turns:
+        starts = starts[-max_turns:]
+
+    for start in starts:
+        window = messages[start:]
+        if start == starts[-1] or not max_tokens or count_tokens_approximately(window) <= max_tokens:
+            return list(window)
@@ -0,0 +1,345 @@
+"""
+Request tracing and latency metrics for the chat API.
+
+Responsibilities:
+- TracingMiddleware: one trace per HTTP request (returned in the
+  X-Trace-Id header), timed until the last byte of the response, so
+  streamed answers are measured in full
+- TraceCallbackHandler: LangChain / LangGraph callbacks adding a span per
+  graph node, tool call, retrieval and LLM call to the request's trace,
+  with durations and token counts
+- Aggregate request and span duration histograms and token counters,
+  rendered in the Prometheus text format (served on /metrics)
+- Log requests slower than SLOW_REQUEST_SECONDS with their spans
+"""
+
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from core.config import SLOW_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Paths that are not traced (monitoring endpoints)
+UNTRACED_PATHS = {"/metrics", "/healthz", "/readyz"}
+
+# Histogram buckets (seconds) of request and span durations
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+# =========================================
+# Metrics
+# =========================================
+
+def _label_text(labels: Tuple[Tuple[str, Any], ...]) -> str:
+    # {key="value",...} with backslashes, quotes and newlines escaped
+    escaped = [
+        key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    ]
+    return "{" + ",".join(escaped) + "}" if escaped else ""
+
+
+class Histogram:
+    """Cumulative histogram per label set, in the Prometheus format."""
+
+    def __init__(self, name: str, help_text: str, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per bucket counts, then the sum and count of the observations
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_text(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set, in the Prometheus format."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_label_text(key)} {value}" for key, value in sorted(self._values.items())]
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "chat_request_duration_seconds", "Duration of HTTP requests, until the last byte of the response."
+)
+SPAN_DURATION = Histogram(
+    "chat_span_duration_seconds", "Duration of graph nodes, tool calls, retrievals and LLM calls."
+)
+LLM_TOKENS = Counter("chat_llm_tokens_total", "Tokens used by LLM calls.")
+SLOW_REQUESTS = Counter("chat_slow_requests_total", "Requests slower than SLOW_REQUEST_SECONDS.")
+
+METRICS = [REQUEST_DURATION, SPAN_DURATION, LLM_TOKENS, SLOW_REQUESTS]
+
+
+def render_metrics() -> str:
+    """All metrics of this process in the Prometheus text format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# =========================================
+# Traces
+# =========================================
+
+class Trace:
+    """
+    Spans of one request. Spans are ``{"span_id", "parent_id", "kind",
+    "name", "start_ms", "duration_ms", "status"}`` dicts, with times
+    relative to the start of the request; LLM spans are named after the
+    model and also carry ``input_tokens`` and ``output_tokens``.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid4().hex
+        self.name = name
+        self.spans: List[dict] = []
+        self.status: Optional[int] = None
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def finish(self, status: int) -> None:
+        self.status = status
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "spans": self.spans,
+        }
+
+
+# Trace of the request being handled
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """
+    Adds a span to ``trace`` per graph node, tool call, retrieval and LLM
+    call of a run. Other runs (chains, edges) are not recorded, but spans
+    nested in them get the nearest recorded ancestor as parent.
+    """
+
+    # Cheap bookkeeping: run in the event loop instead of an executor
+    run_inline = True
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._parents: Dict[UUID, Optional[UUID]] = {}
+        self._open: Dict[UUID, dict] = {}
+        self._lock = threading.Lock()
+
+    def _parent_span(self, parent_run_id: Optional[UUID]) -> Optional[str]:
+        while parent_run_id is not None:
+            if parent_run_id in self._open:
+                return self._open[parent_run_id]["span_id"]
+            parent_run_id = self._parents.get(parent_run_id)
+        return None
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind: Optional[str], name: str, **fields) -> None:
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            if kind is None:
+                return
+            span = {
+                "span_id": run_id.hex[:16],
+                "parent_id": self._parent_span(parent_run_id),
+                "kind": kind,
+                "name": name,
+                "start_ms": round(self.trace.now_ms(), 1),
+                "duration_ms": None,
+                "status": "running",
+                **fields,
+            }
+            self._open[run_id] = span
+            self.trace.spans.append(span)
+
+    def _end(self, run_id: UUID, status: str = "ok", **fields) -> None:
+        with self._lock:
+            self._parents.pop(run_id, None)
+            span = self._open.pop(run_id, None)
+            if span is None:
+                return
+            span["duration_ms"] = round(self.trace.now_ms() - span["start_ms"], 1)
+            span["status"] = status
+            span.update(fields)
+
+    @staticmethod
+    def _name(serialized: Optional[dict], kwargs: dict, default: str) -> str:
+        return kwargs.get("name") or (serialized or {}).get("name") or default
+
+    # Graph nodes: the node's own run carries its name in langgraph_node
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs: Any):
+        name = self._name(serialized, kwargs, "chain")
+        is_node = (metadata or {}).get("langgraph_node") == name
+        self._start(run_id, parent_run_id, "node" if is_node else None, name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._start(run_id, parent_run_id, "tool", self._name(serialized, kwargs, "tool"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._start(run_id, parent_run_id, "retriever", self._name(serialized, kwargs, "retriever"))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs: Any):
+        self._end(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+    def _llm_start(self, serialized, run_id, parent_run_id, kwargs) -> None:
+        metadata = kwargs.get("metadata") or {}
+        name = metadata.get("ls_model_name") or self._name(serialized, kwargs, "llm")
+        self._start(run_id, parent_run_id, "llm", name, input_tokens=None, output_tokens=None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._llm_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs: Any):
+        self._llm_start(serialized, run_id, parent_run_id, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs: Any):
+        # Token counts of chat models are in the message's usage_metadata,
+        # of completion models in llm_output
+        fields = {}
+        generation = response.generations[0][0] if response.generations and response.generations[0] else None
+        if isinstance(generation, ChatGeneration) and generation.message.usage_metadata:
+            usage = generation.message.usage_metadata
+            fields = {"input_tokens": usage["input_tokens"], "output_tokens": usage["output_tokens"]}
+            if generation.message.response_metadata.get("model_name"):
+                fields["name"] = generation.message.response_metadata["model_name"]
+        elif (response.llm_output or {}).get("token_usage"):
+            usage = response.llm_output["token_usage"]
+            fields = {"input_tokens": usage.get("prompt_tokens"), "output_tokens": usage.get("completion_tokens")}
+        self._end(run_id, **fields)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, "error")
+
+
+def trace_callbacks() -> List[BaseCallbackHandler]:
+    """Callbacks recording the run into the current request's trace, if any."""
+    trace = current_trace.get()
+    return [TraceCallbackHandler(trace)] if trace is not None else []
+
+
+def record_trace(trace: Trace, route: str, method: str) -> None:
+    """Add a finished trace to the aggregate metrics, and log it if slow."""
+
+    REQUEST_DURATION.observe(trace.duration, method=method, route=route, status=str(trace.status))
+
+    for span in trace.spans:
+        if span["duration_ms"] is None:
+            continue
+        SPAN_DURATION.observe(span["duration_ms"] / 1000, kind=span["kind"], name=span["name"])
+        if span["kind"] == "llm":
+            for kind in ("input", "output"):
+                if span.get(f"{kind}_tokens"):
+                    LLM_TOKENS.inc(span[f"{kind}_tokens"], model=span["name"], type=kind)
+
+    if SLOW_REQUEST_SECONDS and trace.duration >= SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS.inc(route=route)
+        logger.warning(
+            f"Slow request {trace.name} took {trace.duration:.2f}s: {json.dumps(trace.to_dict(), default=str)}"
+        )
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware starting a trace per HTTP request. The trace is
+    available to the endpoint through ``current_trace`` (and its callbacks
+    through trace_callbacks()), and is finished when the last chunk of the
+    response has been sent.
+    """
+
+    def __init__(self, app, untraced_paths=UNTRACED_PATHS):
+        self.app = app
+        self.untraced_paths = set(untraced_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.untraced_paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        token = current_trace.set(trace)
+        status = 500
+
+        def finish():
+            if trace.duration is not None:
+                return
+            trace.finish(status)
+            # Route template (e.g. /chat/stream) rather than the raw path
+            route = getattr(scope.get("route"), "path", scope["path"])
+            record_trace(trace, route, scope["method"])
+
+        async def traced_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            current_trace.reset(token)
+            finish()
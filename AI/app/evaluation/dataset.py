@@ -4,8 +4,13 @@ Each sample contains:
 - question
 - expected document (for retriever evaluation)
 - ground truth answer (for full RAG evaluation)
+
+Larger datasets are read from JSONL files (one sample per line).
 """
 
+import json
+from typing import Dict, Iterator, Optional
+
 evaluation_set = [
     {
         "question": "How long do refunds take?",
@@ -28,3 +33,18 @@ evaluation_set = [
         "ground_truth_answer": "Potential fraud indicators include high transaction frequency, unusual transaction amounts, and cross-border transactions.",
     },
 ]
+
+
+def iter_dataset(path: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Samples of a JSONL dataset, read lazily line by line, or the built-in
+    evaluation_set when no path is given.
+    """
+    if path is None:
+        yield from evaluation_set
+        return
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,30 @@
+"""
+Shared evaluation metrics:
+- latency percentiles
+- ratios (accuracy, cache hit rates)
+"""
+
+from typing import Dict, List
+import numpy as np
+
+
+def latency_percentiles(latencies: List[float], label: str = "Latency") -> Dict[str, float]:
+    # p50 / p95 / p99 of the measured durations in milliseconds, e.g. "Latency p95 (ms)"
+    if not latencies:
+        return {}
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        f"{label} p50 (ms)": round(float(p50), 2),
+        f"{label} p95 (ms)": round(float(p95), 2),
+        f"{label} p99 (ms)": round(float(p99), 2),
+    }
+
+
+def ratio(part: float, total: float, digits: int = 3):
+    # part / total, or None when there is nothing to divide by (e.g. an empty dataset)
+    return round(part / total, digits) if total else None
+
+
+def hit_rate(hits: int, misses: int):
+    # Share of cache lookups served from the cache
+    return ratio(hits, hits + misses)
@@ -1,23 +1,71 @@
 """
 End-to-end RAG evaluation.
-Measures answer accuracy.
+Measures answer accuracy, latency and token usage.
+
+Questions are answered concurrently, at most ``concurrency`` at a time,
+pulling samples lazily so large datasets are never held in memory. A
+question whose chain call fails is counted in "Errors" (and as a wrong
+answer) without stopping the run; latencies cover the answered questions.
 """
 
-from typing import List, Dict
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from evaluation.metrics import hit_rate, latency_percentiles, ratio
+
+logger = logging.getLogger(__name__)
+
 
+async def aevaluate_rag(chain, evaluation_set: Iterable[Dict], concurrency: int = 8):
+    samples = iter(evaluation_set)
+    usage = UsageMetadataCallbackHandler()
+    embeddings = chain.retriever.vectorstore.embeddings
+    hits_before = getattr(embeddings, "hits", 0)
+    misses_before = getattr(embeddings, "misses", 0)
 
-def evaluate_rag(chain, evaluation_set: List[Dict]):
+    count = 0
     correct = 0
+    errors = 0
+    latencies = []
 
-    for sample in evaluation_set:
-        result = chain.invoke(sample["question"])
-        answer = result["result"]
+    async def worker():
+        nonlocal count, correct, errors
+        for sample in samples:
+            count += 1
+            started = time.perf_counter()
+            try:
+                result = await chain.ainvoke(sample["question"], config={"callbacks": [usage]})
+            except Exception as error:
+                errors += 1
+                logger.warning(f"RAG evaluation failed for question {sample['question']!r}: {error!r}")
+                continue
+            latencies.append(time.perf_counter() - started)
 
-        if sample["ground_truth_answer"].lower() in answer.lower():
-            correct += 1
+            if sample["ground_truth_answer"].lower() in result["result"].lower():
+                correct += 1
 
-    accuracy = correct / len(evaluation_set)
+    # A bounded pool of workers sharing the sample iterator
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    input_tokens = sum(model["input_tokens"] for model in usage.usage_metadata.values())
+    output_tokens = sum(model["output_tokens"] for model in usage.usage_metadata.values())
 
     return {
-        "Answer Accuracy": round(accuracy, 3)
+        "Questions": count,
+        "Errors": errors,
+        "Answer Accuracy": ratio(correct, count),
+        **latency_percentiles(latencies),
+        "Input tokens": input_tokens,
+        "Output tokens": output_tokens,
+        "Tokens per question": ratio(input_tokens + output_tokens, count - errors, digits=1),
+        "Embedding cache hit rate": hit_rate(
+            getattr(embeddings, "hits", 0) - hits_before,
+            getattr(embeddings, "misses", 0) - misses_before,
+        ),
     }
+
+
+def evaluate_rag(chain, evaluation_set: Iterable[Dict], concurrency: int = 8):
+    return asyncio.run(aevaluate_rag(chain, evaluation_set, concurrency))
@@ -2,33 +2,71 @@
 Retriever evaluation metrics:
 - Hit@k
 - Mean Reciprocal Rank (MRR)
+- Search latency per batch and embedding cache hit rate
+
+Questions are evaluated in batches: one embedding call per batch and one
+FAISS search over the batch's query matrix. Latency is therefore measured
+per batch (percentiles over batches), with the mean time per question.
 """
 
-from typing import List, Dict
+import time
+from itertools import islice
+from typing import Dict, Iterable
+import numpy as np
+from evaluation.metrics import hit_rate, latency_percentiles, ratio
+
+
+def _batches(samples: Iterable[Dict], batch_size: int):
+    samples = iter(samples)
+    while batch := list(islice(samples, batch_size)):
+        yield batch
 
 
-def evaluate_retriever(vectorstore, evaluation_set: List[Dict], k: int = 3):
-    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+def evaluate_retriever(vectorstore, evaluation_set: Iterable[Dict], k: int = 3, batch_size: int = 256):
+    embeddings = vectorstore.embeddings
+    hits_before = getattr(embeddings, "hits", 0)
+    misses_before = getattr(embeddings, "misses", 0)
 
+    count = 0
     hits = 0
-    reciprocal_ranks = []
+    reciprocal_rank_sum = 0.0
+    batch_latencies = []
+
+    for batch in _batches(evaluation_set, batch_size):
+        started = time.perf_counter()
+
+        # One embedding request and one index search for the whole batch
+        queries = np.asarray(
+            embeddings.embed_documents([sample["question"] for sample in batch]), dtype=np.float32
+        )
+        if vectorstore._normalize_L2:
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        _, indices = vectorstore.index.search(queries, k)
 
-    for sample in evaluation_set:
-        docs = retriever.get_relevant_documents(sample["question"])
-        retrieved_texts = [doc.page_content for doc in docs]
+        batch_latencies.append(time.perf_counter() - started)
 
-        # Hit@k
-        if sample["expected_doc"] in retrieved_texts:
-            hits += 1
-            rank = retrieved_texts.index(sample["expected_doc"]) + 1
-            reciprocal_ranks.append(1 / rank)
-        else:
-            reciprocal_ranks.append(0)
+        for sample, row in zip(batch, indices):
+            retrieved_texts = [
+                vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+                for i in row if i != -1
+            ]
 
-    hit_at_k = hits / len(evaluation_set)
-    mrr = sum(reciprocal_ranks) / len(evaluation_set)
+            # Hit@k
+            if sample["expected_doc"] in retrieved_texts:
+                hits += 1
+                rank = retrieved_texts.index(sample["expected_doc"]) + 1
+                reciprocal_rank_sum += 1 / rank
+        count += len(batch)
 
     return {
-        "Hit@{}".format(k): round(hit_at_k, 3),
-        "MRR": round(mrr, 3),
+        "Questions": count,
+        "Hit@{}".format(k): ratio(hits, count),
+        "MRR": ratio(reciprocal_rank_sum, count),
+        "Batch size": batch_size,
+        **latency_percentiles(batch_latencies, label="Batch latency"),
+        "Mean latency per question (ms)": ratio(sum(batch_latencies) * 1000, count, digits=2),
+        "Embedding cache hit rate": hit_rate(
+            getattr(embeddings, "hits", 0) - hits_before,
+            getattr(embeddings, "misses", 0) - misses_before,
+        ),
     }
@@ -2,35 +2,51 @@
 Runs full RAG evaluation pipeline.
 """
 
+import argparse
+import json
 from rag.vectorstore import build_vectorstore
 from rag.retriever import build_policy_retriever
 
-from evaluation.dataset import evaluation_set
+from evaluation.dataset import iter_dataset
 from evaluation.retriever_eval import evaluate_retriever
 from evaluation.rag_eval import evaluate_rag
 
 
-def run():
+def run(dataset=None, k: int = 3, batch_size: int = 256, concurrency: int = 8, output=None):
     print("Building vectorstore...")
     vectorstore = build_vectorstore()
 
     print("Building RAG chain...")
-    rag_chain = build_policy_retriever()
+    rag_chain = build_policy_retriever(vectorstore)
 
     print("\nEvaluating Retriever...")
-    retriever_metrics = evaluate_retriever(vectorstore, evaluation_set, k=3)
+    retriever_metrics = evaluate_retriever(vectorstore, iter_dataset(dataset), k=k, batch_size=batch_size)
 
     print("Retriever Metrics:")
-    for k, v in retriever_metrics.items():
-        print(f"{k}: {v}")
+    for key, v in retriever_metrics.items():
+        print(f"{key}: {v}")
 
     print("\nEvaluating Full RAG...")
-    rag_metrics = evaluate_rag(rag_chain, evaluation_set)
+    rag_metrics = evaluate_rag(rag_chain, iter_dataset(dataset), concurrency=concurrency)
 
     print("RAG Metrics:")
-    for k, v in rag_metrics.items():
-        print(f"{k}: {v}")
+    for key, v in rag_metrics.items():
+        print(f"{key}: {v}")
+
+    report = {"retriever": retriever_metrics, "rag": rag_metrics}
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    return report
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Evaluate the policy retriever and RAG chain.")
+    parser.add_argument("--dataset", help="JSONL file of samples (question, expected_doc, ground_truth_answer); defaults to the built-in set")
+    parser.add_argument("--k", type=int, default=3, help="Number of retrieved documents for Hit@k / MRR")
+    parser.add_argument("--batch-size", type=int, default=256, help="Questions embedded and searched per batch")
+    parser.add_argument("--concurrency", type=int, default=8, help="RAG questions answered at the same time")
+    parser.add_argument("--output", help="Write the metrics to this JSON file")
+    args = parser.parse_args()
+
+    run(args.dataset, k=args.k, batch_size=args.batch_size, concurrency=args.concurrency, output=args.output)
@@ -2,11 +2,38 @@
 FastAPI application entry point.
 """
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.chat import router as chat_router
+from api.health import router as health_router
+from api.metrics import router as metrics_router
+from core.app_context import app_context
+from core.config import APP_CONTEXT_LOADING
+from core.tracing import TracingMiddleware
 
-app = FastAPI(title="Business Consulting Agent API")
+# Load the business data and policy index before serving; run under
+# gunicorn --preload this happens once in the master, whose loaded copy the
+# forked workers share
+if APP_CONTEXT_LOADING == "preload":
+    app_context.load_all()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start serving (health probes) right away and load in the background;
+    # /readyz reports when loading is done. A preloaded worker only reloads
+    # what it cannot share with the master (policy retriever, answer cache)
+    warm_up = None
+    if APP_CONTEXT_LOADING in ("background", "preload"):
+        warm_up = asyncio.create_task(app_context.warm_up())
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+
+
+app = FastAPI(title="Business Consulting Agent API", lifespan=lifespan)
 
 # Allow frontend access
 app.add_middleware(
@@ -14,7 +41,14 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the trace id of its requests
+    expose_headers=["X-Trace-Id"],
 )
 
+# Trace every request (spans per graph node, tool, retrieval and LLM call)
+app.add_middleware(TracingMiddleware)
+
 # Register API routes
 app.include_router(chat_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
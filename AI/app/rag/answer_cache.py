@@ -0,0 +1,164 @@
+"""
+Semantic answer cache for policy questions.
+
+Responsibilities:
+- Return the stored answer (and its source documents) of a previous
+  question whose embedding is similar enough to the new one
+- Expire answers after a time-to-live, and discard saved answers of
+  another policy corpus (its hash) on load: the corpus and its index are
+  fixed for the life of the process, so they only change across restarts
+- Persist the cache next to the policy index so that it survives restarts
+  (in a worker thread for the async API, so the event loop is not blocked)
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from core.config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+
+
+class SemanticAnswerCache:
+    """
+    Question embeddings (unit vectors, one row per cached answer) searched
+    by cosine similarity with numpy. Entries are
+    ``{"question", "answer", "sources", "created"}`` dicts.
+
+    Vectors and entries change together under a lock. Changes mark the cache
+    dirty and are written by the next save: add saves right away, aadd in a
+    worker thread, and expiries are written with the next added answer.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        corpus_hash: str,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: Optional[float] = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        path=ANSWER_CACHE_PATH,
+    ):
+        self.embeddings = embeddings
+        self.corpus_hash = corpus_hash
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+
+        self._vectors = None
+        self._entries = []
+        self._dirty = False
+        self._lock = threading.Lock()
+        # Serializes saves, so a later save never writes an older state
+        self._save_lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        # Answers saved for another corpus are discarded
+        if not self.path or not self.path.exists():
+            return
+        with np.load(self.path) as saved:
+            meta = json.loads(str(saved["meta"]))
+            if meta["corpus_hash"] == self.corpus_hash and meta["entries"]:
+                self._vectors = saved["vectors"]
+                self._entries = meta["entries"]
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._save_lock:
+            # Snapshot the current state (the arrays and lists are replaced, never
+            # changed in place); saves queued behind this one find nothing to write
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries, vectors = self._entries, self._vectors
+                self._dirty = False
+
+            meta = json.dumps({"corpus_hash": self.corpus_hash, "entries": entries})
+            vectors = vectors if vectors is not None else np.empty((0, 0), dtype=np.float32)
+
+            # Write to a temporary file first so readers never see a partial cache
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.path.with_name(self.path.stem + ".tmp.npz")
+            np.savez(temporary, vectors=vectors, meta=np.array(meta))
+            os.replace(temporary, self.path)
+
+    def _keep(self, mask) -> None:
+        # Callers hold the lock
+        self._vectors = self._vectors[mask] if mask.any() else None
+        self._entries = [entry for entry, keep in zip(self._entries, mask) if keep]
+        self._dirty = True
+
+    def _expire(self) -> None:
+        # Callers hold the lock
+        if not self.ttl_seconds or not self._entries:
+            return
+        created = np.array([entry["created"] for entry in self._entries])
+        fresh = created > time.time() - self.ttl_seconds
+        if not fresh.all():
+            self._keep(fresh)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _search(self, vector) -> Optional[dict]:
+        with self._lock:
+            self._expire()
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return self._entries[best]
+
+    def _add(self, vector, question: str, answer: str, sources: List[str]) -> dict:
+        entry = {"question": question, "answer": answer, "sources": sources, "created": time.time()}
+        with self._lock:
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+            self._entries = [*self._entries, entry]
+            self._dirty = True
+
+            # Size bound: keep the newest answers
+            if len(self._entries) > self.max_entries:
+                self._keep(np.arange(len(self._entries)) >= len(self._entries) - self.max_entries)
+
+        return entry
+
+    def lookup(self, question: str) -> Optional[dict]:
+        return self._search(self._unit(self.embeddings.embed_query(question)))
+
+    async def alookup(self, question: str) -> Optional[dict]:
+        return self._search(self._unit(await self.embeddings.aembed_query(question)))
+
+    def add(self, question: str, answer: str, sources: List[str]) -> dict:
+        entry = self._add(self._unit(self.embeddings.embed_query(question)), question, answer, sources)
+        self._save()
+        return entry
+
+    async def aadd(self, question: str, answer: str, sources: List[str]) -> dict:
+        entry = self._add(self._unit(await self.embeddings.aembed_query(question)), question, answer, sources)
+        await asyncio.to_thread(self._save)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,200 @@
+"""
+On-disk embedding cache.
+
+Responsibilities:
+- Store embeddings in SQLite keyed by model name + text hash, so repeated
+  texts (policy chunks, repeated questions) are embedded once
+- Bound the cache size, evicting the least recently used entries; hits
+  are recorded in memory and their access time written in batches
+- Coalesce misses: each call embeds its distinct missing texts in one
+  request, and concurrent async calls are merged into a single batch
+- Keep SQLite off the event loop: the async path reads and writes the
+  cache in worker threads
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from core.config import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Access times of hits are written with the next store, or once this many
+# hits are waiting
+TOUCH_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings object with a persistent cache. Vectors are stored
+    as float64 bytes, so cached and freshly computed vectors are identical.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        path=EMBEDDING_CACHE_PATH,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+        # Hits whose access time is not written yet: key -> last access
+        self._touched: Dict[str, float] = {}
+
+        # Async misses waiting for the next batch, and those being embedded
+        self._pending = {}
+        self._inflight = {}
+        self._flush_task = None
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limits the number of query parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float64).tolist()) for key, vector in rows)
+
+            self._touched.update(dict.fromkeys(found, time.time()))
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touched()
+                self._conn.commit()
+
+            self.hits += sum(key in found for key in keys)
+            self.misses += sum(key not in found for key in keys)
+        return found
+
+    def _write_touched(self) -> None:
+        # Called with the lock held; the caller commits
+        touched, self._touched = self._touched, {}
+        self._conn.executemany(
+            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+            [(last_access, key) for key, last_access in touched.items()],
+        )
+
+    def _store(self, keys: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float64).tobytes(), now) for key, vector in zip(keys, vectors)],
+            )
+            self._write_touched()
+
+            # Size bound: drop the least recently used entries
+            excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        vectors = self._lookup(keys)
+
+        # One request for the distinct missing texts
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            computed = self.embeddings.embed_documents(list(missing.values()))
+            self._store(list(missing), computed)
+            vectors.update(zip(missing, computed))
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        vectors = await asyncio.to_thread(self._lookup, keys)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            vectors.update(await self._aembed_missing(missing))
+
+        return [vectors[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    async def _aembed_missing(self, missing: Dict[str, str]) -> Dict[str, List[float]]:
+        # Join the texts already being embedded, queue the others for the
+        # next batch
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for key, text in missing.items():
+            if key not in self._inflight:
+                self._inflight[key] = loop.create_future()
+                self._pending[key] = text
+            futures[key] = self._inflight[key]
+
+        if self._pending and self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+        # Shielded: a cancelled caller must not cancel the texts it shares
+        return {key: await asyncio.shield(future) for key, future in futures.items()}
+
+    async def _flush(self) -> None:
+        # Yield once so that concurrent callers add their misses to the batch
+        await asyncio.sleep(0)
+        pending, self._pending, self._flush_task = self._pending, {}, None
+        keys = list(pending)
+
+        computed = error = None
+        try:
+            computed = await self.embeddings.aembed_documents([pending[key] for key in keys])
+        except Exception as exc:
+            error = exc
+        finally:
+            # Callers are answered before the cache is written, so a failing
+            # store cannot leave them waiting
+            for index, key in enumerate(keys):
+                future = self._inflight.pop(key)
+                if future.done():
+                    continue
+                if computed is not None:
+                    future.set_result(computed[index])
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.cancel()
+
+        if computed is None:
+            return
+        try:
+            await asyncio.to_thread(self._store, keys, computed)
+        except Exception as exc:
+            # Only the cache is lost: these texts are embedded again next time
+            logger.warning(f"Failed to store {len(keys)} embeddings in the cache: {exc!r}")
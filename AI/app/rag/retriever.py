@@ -2,22 +2,18 @@
 Creates a RetrievalQA chain for policy lookup.
 """
 
-from langchain_openai import ChatOpenAI
 from langchain.chains import RetrievalQA
-from core.config import OPENAI_API_KEY
+from core.providers import build_chat_model
 from rag.vectorstore import build_vectorstore
 
 
-def build_policy_retriever():
+def build_policy_retriever(vectorstore=None):
     # LLM used for answering policy questions
-    llm = ChatOpenAI(
-        model="gpt-4o",
-        temperature=0.0,
-        openai_api_key=OPENAI_API_KEY
-    )
+    llm = build_chat_model(model="gpt-4o", temperature=0.0)
 
-    # Vector search backend
-    vectorstore = build_vectorstore()
+    # Vector search backend (built unless the caller already has it)
+    if vectorstore is None:
+        vectorstore = build_vectorstore()
 
     # Configure retriever explicitly
     retriever = vectorstore.as_retriever(
@@ -25,9 +21,10 @@ def build_policy_retriever():
         search_kwargs={"k": 3}
     )
 
-    # Retrieval-based QA chain
+    # Retrieval-based QA chain (answers come with their source chunks)
     return RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
-        retriever=retriever
+        retriever=retriever,
+        return_source_documents=True
     )
@@ -1,26 +1,109 @@
 """
 Builds the FAISS vector store for policy documents.
+
+The index is saved to VECTORSTORE_DIR together with a manifest of the
+embedding model and the ids (content hashes) of the indexed chunks. It is
+loaded from disk while the policy corpus and model are unchanged, and
+updated incrementally (only new chunks are embedded) when documents change.
 """
 
+import hashlib
+import json
+from pathlib import Path
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
-from core.config import OPENAI_API_KEY
+from core.config import VECTORSTORE_DIR
+from core.providers import build_embedding_model, embedding_model_name
+from rag.embedding_cache import CachedEmbeddings
 from rag.policies import policy_docs
 
-def build_vectorstore():
+# Embedding model of the configured provider
+EMBEDDING_MODEL = embedding_model_name()
+
+MANIFEST_NAME = "manifest.json"
+
+
+def build_embeddings():
+    # Initialize embeddings, behind the on-disk embedding cache
+    return CachedEmbeddings(build_embedding_model(), model=EMBEDDING_MODEL)
+
+
+def split_policies(docs=policy_docs):
     # Split documents into overlapping chunks
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=400,
         chunk_overlap=50
     )
-    chunks = splitter.split_documents(policy_docs)
+    return splitter.split_documents(docs)
+
+
+def chunk_id(chunk) -> str:
+    # Content hash of a chunk (text and metadata), used as its docstore id
+    payload = json.dumps([chunk.page_content, chunk.metadata], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def corpus_hash(chunk_ids, model: str = EMBEDDING_MODEL) -> str:
+    # Version of the index: embedding model and the set of chunks
+    payload = json.dumps([model, sorted(chunk_ids)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-    # Initialize OpenAI embeddings
-    embeddings = OpenAIEmbeddings(
-        model="text-embedding-3-small",
-        openai_api_key=OPENAI_API_KEY
+
+def policy_corpus_hash(docs=policy_docs, model: str = EMBEDDING_MODEL) -> str:
+    """Hash of the policy corpus as indexed (chunks and embedding model)."""
+    # Identical chunks are indexed once, as in build_vectorstore
+    return corpus_hash({chunk_id(chunk) for chunk in split_policies(docs)}, model)
+
+
+def build_vectorstore(docs=policy_docs, index_dir=VECTORSTORE_DIR, rebuild: bool = False):
+    """
+    FAISS index of the policy chunks, loaded from ``index_dir`` when it was
+    built from the same chunks and model, otherwise updated (new chunks
+    added, removed ones deleted) or rebuilt (other model, or ``rebuild``)
+    and saved back.
+    """
+
+    index_dir = Path(index_dir)
+    manifest_path = index_dir / MANIFEST_NAME
+    embeddings = build_embeddings()
+
+    # Identical chunks are indexed once
+    chunks = {}
+    for chunk in split_policies(docs):
+        chunks.setdefault(chunk_id(chunk), chunk)
+    index_key = corpus_hash(chunks)
+
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    reusable = (
+        not rebuild
+        and manifest.get("embedding_model") == EMBEDDING_MODEL
+        and (index_dir / "index.faiss").exists()
     )
 
-    # Build FAISS index
-    return FAISS.from_documents(chunks, embeddings)
+    if reusable:
+        # Our own index: its docstore is pickled by save_local
+        vectorstore = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+        if manifest.get("corpus_hash") == index_key:
+            return vectorstore
+
+        indexed = set(manifest["chunk_ids"])
+        removed = [cid for cid in indexed if cid not in chunks]
+        added = [cid for cid in chunks if cid not in indexed]
+
+        if removed:
+            vectorstore.delete(removed)
+        if added:
+            vectorstore.add_documents([chunks[cid] for cid in added], ids=added)
+    else:
+        # Build FAISS index
+        vectorstore = FAISS.from_documents(list(chunks.values()), embeddings, ids=list(chunks))
+
+    index_dir.mkdir(parents=True, exist_ok=True)
+    vectorstore.save_local(index_dir)
+    manifest_path.write_text(json.dumps({
+        "corpus_hash": index_key,
+        "embedding_model": EMBEDDING_MODEL,
+        "chunk_ids": list(chunks),
+    }, indent=2))
+
+    return vectorstore
@@ -20,5 +20,19 @@ def test_chat_api():
     else:
         print("Error:", response.status_code, response.text)
 
+def test_chat_stream_api():
+
+    payload = {
+        "message": "Which policies apply to transactions above 500 EUR?",
+        "session_id": None
+    }
+
+    # Print the server-sent events as they arrive
+    with requests.post(f"{BASE_URL}/chat/stream", json=payload, stream=True) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                print(line)
+
 if __name__ == "__main__":
     test_chat_api()
+    test_chat_stream_api()
@@ -0,0 +1,36 @@
+import pandas as pd
+from core.data_loader import BusinessDataIndex
+
+
+def test_business_data_index_empty_frame():
+    # e.g. load_business_data(start, end) over a range without transactions
+    data = pd.DataFrame({
+        "transaction_id": pd.Series([], dtype="Int64"),
+        "customer_id": pd.Series([], dtype="Int64"),
+    })
+
+    index = BusinessDataIndex(data)
+
+    assert len(index) == 0
+    assert index.transaction(1).empty
+    assert index.customer(1).empty
+
+
+def test_business_data_index_lookups():
+    data = pd.DataFrame({
+        "transaction_id": pd.Series([3, 1, 2, None], dtype="Int64"),
+        "customer_id": pd.Series([10, 20, 10, 20], dtype="Int64"),
+    })
+
+    index = BusinessDataIndex(data)
+
+    assert index.transaction(2).index.tolist() == [2]
+    assert index.transaction(4).empty
+    assert index.customer(10).index.tolist() == [0, 2]
+    assert index.customer("unknown").empty
+
+
+if __name__ == "__main__":
+    test_business_data_index_empty_frame()
+    test_business_data_index_lookups()
+    print("BusinessDataIndex tests passed")
@@ -0,0 +1,161 @@
+"""
+Benchmark of the ETL pipeline on generated raw data.
+
+For every size, generates customers.csv / transactions.csv with the quirks
+of raw_data (generate_data.py), runs the pipeline on them in a separate
+process with WAREHOUSE_RAW_DATA_DIR / WAREHOUSE_PROCESSED_DATA_DIR pointed
+at a temporary directory (so raw_data and processed_data are untouched and
+every size gets its own peak memory), and records the wall time, row count
+and peak RSS of each stage. The results are printed as one JSON line per
+size and written to --output as a JSON report.
+
+Usage:
+    python data_warehouse/benchmarks/etl_benchmark.py
+    python data_warehouse/benchmarks/etl_benchmark.py --rows 1000000 10000000 --output etl_benchmark.json
+    python data_warehouse/benchmarks/etl_benchmark.py --rows 100000000 --chunksize 1000000
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from generate_data import DEFAULT_CHUNK_ROWS, generate_dataset
+
+PIPELINE_DIR = Path(__file__).resolve().parent.parent / "etl"
+
+
+def peak_rss_mb() -> float:
+    # Peak resident set size of this process so far (ru_maxrss is in KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _directory_bytes(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def run_stages(chunksize: int | None, result_path: Path) -> None:
+    """
+    Child process: run the pipeline on the configured directories and write
+    the metrics of each stage to ``result_path``.
+    """
+
+    sys.path.append(str(PIPELINE_DIR))
+    import pipeline
+
+    if chunksize:
+        _, report = pipeline.run_streaming_pipeline(chunksize=chunksize)
+    else:
+        _, report = pipeline.run_pipeline()
+
+    # Stage metrics recorded by utils.instrumentation
+    stages = [
+        {
+            "stage": entry["stage"],
+            "seconds": entry["seconds"],
+            "rows_in": entry["rows_in"],
+            "rows_out": entry["rows_out"],
+            "bytes_read": entry["bytes_read"],
+            "bytes_written": entry["bytes_written"],
+            "peak_rss_mb": round(entry["peak_rss_bytes"] / 2**20, 1),
+        }
+        for entry in report
+    ]
+
+    result_path.write_text(json.dumps({"stages": stages, "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_benchmark(
+    rows: int,
+    chunksize: int | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    keep_data: bool = False,
+    seed: int = 42,
+) -> dict:
+    work_dir = Path(tempfile.mkdtemp(prefix=f"etl_benchmark_{rows}_"))
+    raw_dir, processed_dir = work_dir / "raw_data", work_dir / "processed_data"
+    result_path = work_dir / "result.json"
+
+    generated = generate_dataset(raw_dir, rows, chunk_rows=chunk_rows, seed=seed)
+
+    env = dict(
+        os.environ,
+        WAREHOUSE_RAW_DATA_DIR=str(raw_dir),
+        WAREHOUSE_PROCESSED_DATA_DIR=str(processed_dir),
+    )
+    command = [sys.executable, __file__, "--run-stages", str(result_path)]
+    if chunksize:
+        command += ["--chunksize", str(chunksize)]
+
+    start = time.perf_counter()
+    subprocess.run(command, env=env, check=True)
+    total_seconds = round(time.perf_counter() - start, 3)
+
+    result = json.loads(result_path.read_text())
+    benchmark = {
+        "rows": rows,
+        "mode": "streaming" if chunksize else "in_memory",
+        "chunksize": chunksize,
+        **generated,
+        "total_seconds": total_seconds,
+        "peak_rss_mb": result["peak_rss_mb"],
+        "processed_bytes": _directory_bytes(processed_dir),
+        "stages": result["stages"],
+    }
+
+    if keep_data:
+        benchmark["data_dir"] = str(work_dir)
+    else:
+        shutil.rmtree(work_dir)
+
+    return benchmark
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline on generated raw data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000], help="Transactions per run")
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Run the streaming pipeline with chunks of this many rows (default: in-memory pipeline).",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per generated chunk")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the generated and processed data")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--run-stages", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_stages:
+        run_stages(args.chunksize, Path(args.run_stages))
+        return
+
+    results = []
+    for rows in args.rows:
+        result = run_benchmark(rows, args.chunksize, args.chunk_rows, args.keep_data, args.seed)
+        print(json.dumps({key: value for key, value in result.items() if key != "stages"}), flush=True)
+        results.append(result)
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "runs": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Synthetic raw data for the ETL benchmarks.
+
+Writes customers.csv and transactions.csv shaped like the files in
+raw_data, with the same quirks the silver layer cleans up:
+- mixed-case categories ("food", "Food", "electronics", ...) and missing ones
+- missing currencies and unnormalized codes ("eur", " sek")
+- re-sent transaction_ids (~2.5%) with a different timestamp
+- transactions without a customer_id (~0.15%)
+
+Rows are generated and written in chunks, so files of 10^8 transactions
+never have to fit in memory. Customers are a quarter of the transactions,
+as in raw_data.
+
+Usage:
+    python data_warehouse/benchmarks/generate_data.py --transactions 1000000 --output /tmp/raw_1m
+"""
+
+import argparse
+import time
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+
+CUSTOMER_COLUMNS = ["customer_id", "country", "signup_date", "email"]
+TRANSACTION_COLUMNS = ["transaction_id", "customer_id", "amount", "currency", "category", "timestamp"]
+
+COUNTRIES = np.array(["SE", "FI", "NO", "DK"])
+
+# Raw values and their share of the rows (None = missing), as in raw_data
+CURRENCIES = (["EUR", "SEK", "NOK", " sek", "eur", None], [0.29, 0.21, 0.2, 0.1, 0.1, 0.1])
+CATEGORIES = (["food", "Electronics", "Food", "electronics", None], [0.2, 0.2, 0.2, 0.2, 0.2])
+
+DUPLICATE_RATE = 0.025
+NULL_CUSTOMER_RATE = 0.0015
+
+SIGNUP_START = np.datetime64("2019-01-01")
+SIGNUP_DAYS = 1800
+TRANSACTION_START = np.datetime64("2020-01-01T00:00:00")
+TRANSACTION_MINUTES = 4 * 365 * 24 * 60
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _choice(values, probabilities, rows, rng) -> pa.Array:
+    picks = rng.choice(len(values), size=rows, p=probabilities)
+    return pa.array(values, pa.string()).take(pa.array(picks))
+
+
+def customer_chunk(first_id: int, rows: int, rng: np.random.Generator) -> pa.Table:
+    ids = np.arange(first_id, first_id + rows)
+    return pa.table({
+        "customer_id": ids,
+        "country": pa.array(COUNTRIES[rng.integers(0, len(COUNTRIES), rows)]),
+        "signup_date": SIGNUP_START + rng.integers(0, SIGNUP_DAYS, rows).astype("timedelta64[D]"),
+        "email": pa.array(np.char.add(np.char.add("user", (ids - 1).astype(str)), "@example.com")),
+    })
+
+
+def transaction_chunk(first_id: int, rows: int, customers: int, rng: np.random.Generator) -> pa.Table:
+    # Fresh transactions, plus re-sent copies of some of them
+    ids = np.arange(first_id, first_id + rows)
+    duplicates = rng.choice(ids, size=int(rows * DUPLICATE_RATE), replace=False) if rows else ids[:0]
+    ids = np.concatenate([ids, duplicates])
+    total = len(ids)
+
+    customer_ids = pa.array(
+        rng.integers(1, customers + 1, total),
+        mask=rng.random(total) < NULL_CUSTOMER_RATE,
+    )
+    timestamps = TRANSACTION_START + rng.integers(0, TRANSACTION_MINUTES, total).astype("timedelta64[m]")
+
+    return pa.table({
+        "transaction_id": ids,
+        "customer_id": customer_ids,
+        "amount": np.round(rng.uniform(1, 1000, total), 2),
+        "currency": _choice(*CURRENCIES, total, rng),
+        "category": _choice(*CATEGORIES, total, rng),
+        "timestamp": pa.array(timestamps.astype("datetime64[s]")),
+    })
+
+
+def _write_csv(path: Path, columns, chunks) -> int:
+    # Header as in raw_data (unquoted), then the chunks without quoting
+    path.write_text(",".join(columns) + "\n")
+    rows = 0
+    with open(path, "ab") as file:
+        for chunk in chunks:
+            pv.write_csv(chunk, file, pv.WriteOptions(include_header=False, quoting_style="none"))
+            rows += chunk.num_rows
+    return rows
+
+
+def generate_dataset(
+    output_dir,
+    transactions: int,
+    customers: int | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    seed: int = 42,
+) -> dict:
+    """
+    Write customers.csv and transactions.csv for ``transactions`` fresh
+    transactions (plus the re-sent duplicates) into ``output_dir``.
+    Returns the row counts, file sizes and generation time.
+    """
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    customers = customers or max(transactions // 4, 1)
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+
+    customer_rows = _write_csv(
+        output_dir / "customers.csv",
+        CUSTOMER_COLUMNS,
+        (
+            customer_chunk(first, min(chunk_rows, customers - first + 1), rng)
+            for first in range(1, customers + 1, chunk_rows)
+        ),
+    )
+    transaction_rows = _write_csv(
+        output_dir / "transactions.csv",
+        TRANSACTION_COLUMNS,
+        (
+            transaction_chunk(first, min(chunk_rows, transactions - first + 1), customers, rng)
+            for first in range(1, transactions + 1, chunk_rows)
+        ),
+    )
+
+    return {
+        "customers": customer_rows,
+        "transactions": transaction_rows,
+        "raw_bytes": sum((output_dir / name).stat().st_size for name in ("customers.csv", "transactions.csv")),
+        "generate_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic customers.csv / transactions.csv.")
+    parser.add_argument("--transactions", type=int, required=True, help="Number of distinct transactions")
+    parser.add_argument("--customers", type=int, default=None, help="Number of customers (default: transactions / 4)")
+    parser.add_argument("--output", required=True, help="Directory to write the CSV files to")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(generate_dataset(args.output, args.transactions, args.customers, args.chunk_rows, args.seed))
+
+
+if __name__ == "__main__":
+    main()
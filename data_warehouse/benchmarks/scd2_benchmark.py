@@ -0,0 +1,113 @@
+"""
+Benchmark of the SCD2 upsert of dim_customers on synthetic data.
+
+For every size, times the initial load, an incremental run with a share of
+changed and new customers, and a batch run applying several change dates
+at once, and prints one JSON line per size.
+
+Usage:
+    python data_warehouse/benchmarks/scd2_benchmark.py
+    python data_warehouse/benchmarks/scd2_benchmark.py --rows 1000000 10000000 --change-rate 0.02
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add the gold layer and the data_warehouse root to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent / "etl" / "gold"))
+sys.path.append(str(Path(__file__).resolve().parent.parent / ""))
+
+from dim_customers import EMPTY_DIM_CUSTOMER, scd2_upsert_customer
+
+COUNTRIES = np.array(["NO", "SE", "DK", "FI", "DE", "GB", "US", "NL"], dtype=object)
+
+
+def make_customers(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    # Silver-shaped customer snapshot
+    return pd.DataFrame({
+        "customer_id": np.arange(1, rows + 1),
+        "country": COUNTRIES[rng.integers(0, len(COUNTRIES), rows)],
+        "signup_date": pd.Timestamp("2019-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D"),
+    })
+
+
+def change_customers(customers: pd.DataFrame, change_rate: float, rng: np.random.Generator) -> pd.DataFrame:
+    # Move a share of the customers to another country and add as many new ones
+    changed = customers.copy()
+    moved = rng.random(len(changed)) < change_rate
+    changed.loc[moved, "country"] = COUNTRIES[rng.integers(0, len(COUNTRIES), moved.sum())]
+
+    new = make_customers(int(len(customers) * change_rate), rng)
+    new["customer_id"] += len(customers)
+    return pd.concat([changed, new], ignore_index=True)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, round(time.perf_counter() - start, 3)
+
+
+def run_benchmark(rows: int, change_rate: float, batch_dates: int, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    customers = make_customers(rows, rng)
+
+    dim, initial_seconds = _timed(lambda: scd2_upsert_customer(EMPTY_DIM_CUSTOMER, customers))
+    initial_rows = len(dim)
+
+    staging = change_customers(customers, change_rate, rng)
+    dim, incremental_seconds = _timed(
+        lambda: scd2_upsert_customer(dim, staging, run_date=pd.Timestamp("2024-01-01"))
+    )
+    # Inserted and expired versions; dim_customers is a single file, so the
+    # whole dimension is still rewritten on every run
+    incremental_rows_changed = len(dim) - initial_rows + int((~dim["is_current"]).sum())
+    incremental_rows_written = len(dim)
+    del staging
+
+    # Several snapshots per customer, one per change date
+    batch = pd.concat(
+        [
+            change_customers(customers, change_rate, rng).assign(
+                change_date=pd.Timestamp("2024-02-01") + pd.DateOffset(months=offset)
+            )
+            for offset in range(batch_dates)
+        ],
+        ignore_index=True,
+    )
+    del customers
+    dim, batch_seconds = _timed(
+        lambda: scd2_upsert_customer(dim, batch, change_date_column="change_date")
+    )
+
+    return {
+        "rows": rows,
+        "change_rate": change_rate,
+        "initial_seconds": initial_seconds,
+        "incremental_seconds": incremental_seconds,
+        "incremental_rows_changed": incremental_rows_changed,
+        "incremental_rows_written": incremental_rows_written,
+        "batch_snapshots": len(batch),
+        "batch_seconds": batch_seconds,
+        "dimension_rows": len(dim),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dim_customers SCD2 upsert.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--change-rate", type=float, default=0.01)
+    parser.add_argument("--batch-dates", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    for rows in args.rows:
+        print(json.dumps(run_benchmark(rows, args.change_rate, args.batch_dates)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,23 @@
 # Import dependencies
 
 import os
+import sys
+from pathlib import Path
 import pandas as pd
 import logging
 import datetime as datetime
 
-# Define directory containing csv files
-DATA_DIR = "../../raw_data"
+# Add the data_warehouse root to sys.path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
+
+from utils.instrumentation import add_bytes_read, instrumented, path_bytes
+
+# Define directory containing csv files (resolved from this file so the
+# extract works regardless of the current working directory; overridable
+# with WAREHOUSE_RAW_DATA_DIR, e.g. for benchmarks on generated data)
+DATA_DIR = Path(os.getenv(
+    "WAREHOUSE_RAW_DATA_DIR", Path(__file__).resolve().parent.parent.parent / "raw_data"
+))
 
 # Set up logging
 logging.basicConfig(
@@ -20,7 +31,30 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Default number of rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 500_000
+
+# Explicit dtypes for streaming reads, so low-cardinality text columns are
+# stored as categoricals and ids keep a nullable integer type
+CUSTOMER_DTYPES = {
+    "customer_id": "Int64",
+    "country": "string",
+    "email": "string",
+}
+TRANSACTION_DTYPES = {
+    "transaction_id": "Int64",
+    "customer_id": "Int64",
+    "amount": "float64",
+    "currency": "category",
+    "category": "category",
+}
+
+# Columns parsed as timestamps in streaming mode
+CUSTOMER_DATE_COLUMNS = ["signup_date"]
+TRANSACTION_DATE_COLUMNS = ["timestamp"]
+
 # Function to extract data
+@instrumented()
 def extract_data():
     """Load structured CSVs."""
     logger.info("=====Loading customers.csv and transactions.csv=====")
@@ -28,6 +62,7 @@ def extract_data():
     # Load CSV files
     customers = pd.read_csv(os.path.join(DATA_DIR, "customers.csv"))
     transactions = pd.read_csv(os.path.join(DATA_DIR, "transactions.csv"))
+    add_bytes_read(path_bytes(DATA_DIR / "customers.csv") + path_bytes(DATA_DIR / "transactions.csv"))
 
     # Add created_at to both DataFrames to presrve the timestamp of when the data was loaded into the data warehouse
     now = datetime.datetime.now()
@@ -39,4 +74,39 @@ def extract_data():
     # Return the loaded data
     return customers, transactions
 
-extract_data()
\ No newline at end of file
+
+def _read_csv_chunks(file_name, dtypes, date_columns, chunksize, usecols=None):
+    # Stream a raw CSV with explicit dtypes, one chunk at a time
+    now = datetime.datetime.now()
+    path = os.path.join(DATA_DIR, file_name)
+    add_bytes_read(path_bytes(path))
+
+    with pd.read_csv(path, dtype=dtypes, usecols=usecols, chunksize=chunksize) as reader:
+        for chunk in reader:
+            for column in date_columns:
+                if column in chunk.columns:
+                    chunk[column] = pd.to_datetime(chunk[column], errors="coerce")
+
+            # Preserve the timestamp of when the data was loaded, as in extract_data
+            chunk["created_at"] = now
+            yield chunk
+
+
+def extract_customers_chunks(chunksize: int = DEFAULT_CHUNKSIZE, usecols=None):
+    """Stream customers.csv in chunks of ``chunksize`` rows."""
+    logger.info(f"=====Streaming customers.csv in chunks of {chunksize} rows=====")
+    yield from _read_csv_chunks(
+        "customers.csv", CUSTOMER_DTYPES, CUSTOMER_DATE_COLUMNS, chunksize, usecols
+    )
+
+
+def extract_transactions_chunks(chunksize: int = DEFAULT_CHUNKSIZE, usecols=None):
+    """Stream transactions.csv in chunks of ``chunksize`` rows."""
+    logger.info(f"=====Streaming transactions.csv in chunks of {chunksize} rows=====")
+    yield from _read_csv_chunks(
+        "transactions.csv", TRANSACTION_DTYPES, TRANSACTION_DATE_COLUMNS, chunksize, usecols
+    )
+
+
+if __name__ == "__main__":
+    extract_data()
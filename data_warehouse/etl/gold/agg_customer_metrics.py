@@ -0,0 +1,128 @@
+import sys
+from pathlib import Path
+import pandas as pd
+
+# Add parent directory to sys.path at module level
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
+
+from utils.helper_functions import logger, read_table, table_exists, table_path, write_table
+from utils.instrumentation import instrumented
+
+# Output paths for the aggregate tables
+output_path = table_path("agg_customer_metrics")
+category_output_path = table_path("agg_customer_category_spend")
+
+# Additive measures: partial aggregates are combined by summing them, so the
+# tables can be refreshed from the new (and superseded) facts only
+METRIC_COLUMNS = ["transaction_count", "total_spend_eur", "high_value_transaction_count"]
+CATEGORY_METRIC_COLUMNS = ["transaction_count", "total_spend_eur"]
+
+
+def aggregate_customer_metrics(fact_transactions: pd.DataFrame, dim_category: pd.DataFrame, sign: int = 1):
+    """
+    Partial aggregates of a set of facts, indexed by customer (and category).
+    ``sign=-1`` gives the aggregates to subtract for facts being replaced.
+    """
+
+    # Only facts with a valid customer version, as in the analytics dataset
+    facts = fact_transactions[fact_transactions["customer_key"].notna()]
+
+    metrics = facts.groupby("customer_id").agg(
+        transaction_count=("transaction_id", "count"),
+        total_spend_eur=("transaction_amount_eur", "sum"),
+        high_value_transaction_count=("is_high_value_transaction", "sum"),
+    )
+
+    category_spend = (
+        facts[["customer_id", "category_key", "transaction_id", "transaction_amount_eur"]]
+        .merge(dim_category[["category_key", "category"]], on="category_key", how="left")
+        .groupby(["customer_id", "category"])
+        .agg(
+            transaction_count=("transaction_id", "count"),
+            total_spend_eur=("transaction_amount_eur", "sum"),
+        )
+    )
+
+    return metrics * sign, category_spend * sign
+
+
+def _sum_parts(parts, keys, metric_columns):
+    # Sum partial aggregates and drop the groups left without transactions
+    combined = pd.concat(parts).groupby(level=keys)[metric_columns].sum()
+    combined = combined[combined["transaction_count"] > 0]
+    return combined.sort_index().reset_index()
+
+
+@instrumented()
+def combine_customer_metrics(parts, write: bool = True):
+    """
+    Sum partial aggregates (from aggregate_customer_metrics or the stored
+    tables) into the final tables, and save them unless ``write`` is False.
+    """
+
+    metrics = _sum_parts([part[0] for part in parts], ["customer_id"], METRIC_COLUMNS)
+    metrics["average_transaction_eur"] = metrics["total_spend_eur"] / metrics["transaction_count"]
+
+    category_spend = _sum_parts(
+        [part[1] for part in parts], ["customer_id", "category"], CATEGORY_METRIC_COLUMNS
+    )
+
+    if write:
+        write_table(metrics, "agg_customer_metrics")
+        write_table(category_spend, "agg_customer_category_spend")
+        logger.info(
+            f"Customer aggregates saved: {len(metrics)} customers, "
+            f"{len(category_spend)} customer x category rows"
+        )
+
+    return metrics, category_spend
+
+
+@instrumented()
+def build_agg_customer_metrics(fact_transactions: pd.DataFrame, dim_category: pd.DataFrame, write: bool = True):
+    """
+    Per-customer transaction count, spend and average, plus spend per
+    customer and category, from the fact table. Returns both tables.
+    """
+    return combine_customer_metrics([aggregate_customer_metrics(fact_transactions, dim_category)], write=write)
+
+
+@instrumented()
+def refresh_agg_customer_metrics(
+    new_facts: pd.DataFrame,
+    superseded_facts: pd.DataFrame,
+    dim_category: pd.DataFrame,
+):
+    """
+    Update the stored aggregates with the facts loaded by an incremental run:
+    add the new facts and subtract the versions they replaced.
+    """
+
+    if not table_exists("agg_customer_metrics"):
+        logger.info("No customer aggregates found, building them from the full fact table...")
+        return build_agg_customer_metrics(read_table("fact_transactions"), dim_category)
+
+    metrics, category_spend = load_agg_customer_metrics()
+    stored = (
+        metrics.set_index("customer_id")[METRIC_COLUMNS],
+        category_spend.set_index(["customer_id", "category"])[CATEGORY_METRIC_COLUMNS],
+    )
+
+    return combine_customer_metrics([
+        stored,
+        aggregate_customer_metrics(new_facts, dim_category),
+        aggregate_customer_metrics(superseded_facts, dim_category, sign=-1),
+    ])
+
+
+def load_agg_customer_metrics():
+    # Read the persisted aggregate tables back with their types
+    return read_table("agg_customer_metrics"), read_table("agg_customer_category_spend")
+
+
+# Usage & Quality checks
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["metrics"])
@@ -9,17 +9,15 @@ sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 
 from transform_transactiions_data import transform_transactions_data
 
-from utils.helper_functions import logger
+from utils.helper_functions import logger, read_table, table_path, write_table
+from utils.instrumentation import instrumented
 
 # Output path for the dimension table
-output_path = (
-    Path(__file__).resolve().parent.parent.parent
-    / "processed_data"
-    / "dim_categories.csv"
-)
+output_path = table_path("dim_categories")
 
 
-def build_dim_category(transform_transactions_fn):
+@instrumented()
+def build_dim_category(transform_transactions_fn, write: bool = True):
     # Prepare transactions
     transactions_df = transform_transactions_fn()
     
@@ -78,18 +76,24 @@ def build_dim_category(transform_transactions_fn):
         ]
     ]
 
-    # Save dimension table to CSV
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    dim_category.to_csv(output_path, index=False)
+    # Save dimension table
+    if write:
+        write_table(dim_category, "dim_categories")
 
     return dim_category
 
 
+def load_dim_category() -> pd.DataFrame:
+    # Read the persisted dimension table back with its types
+    return read_table("dim_categories")
+
+
 # Usage & Quality checks
 
-logger.info("Building dim_category dimension table...")
-dim_category = build_dim_category(transform_transactions_data)
-print(dim_category.head())
-print(len(dim_category))
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["category"])
 # print(dim_category["transaction_key"].nunique())
 # print("INFO==>>",dim_category.info())
@@ -6,20 +6,18 @@ import pandas as pd
 sys.path.append(str(Path(__file__).resolve().parent.parent / "silver"))
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 
-from utils.helper_functions import logger
+from utils.helper_functions import logger, read_table, table_path, write_table
+from utils.instrumentation import instrumented
 
 # Import the transformation function for transactions data
 from transform_transactiions_data import transform_transactions_data
 
 # Output path for the dimension table
-output_path = (
-    Path(__file__).resolve().parent.parent.parent
-    / "processed_data"
-    / "dim_currencies.csv"
-)
+output_path = table_path("dim_currencies")
 
 
-def build_dim_currency(transform_transactions_fn):
+@instrumented()
+def build_dim_currency(transform_transactions_fn, write: bool = True):
     # Prepare transactions
     transactions_df = transform_transactions_fn()
     
@@ -77,19 +75,27 @@ def build_dim_currency(transform_transactions_fn):
         ]
     ]
 
-    # Save dimension table to CSV
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    dim_currency.to_csv(output_path, index=False)
+    # Save dimension table
+    if write:
+        write_table(dim_currency, "dim_currencies")
     
     # Quality check to ensure transaction_currency is unique in the dimension table
     assert dim_currency["transaction_currency"].is_unique
     return dim_currency
 
 
+def load_dim_currency() -> pd.DataFrame:
+    # Read the persisted dimension table back with its types
+    return read_table("dim_currencies")
+
+
 # Usage & Quality checks
 
-logger.info("Building dim_currency dimension table...")
-dim_currency = build_dim_currency(transform_transactions_data)
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["currency"])
 # print(dim_currency.head())
 # print(len(dim_currency))
 # print(dim_currency.info())
@@ -6,22 +6,17 @@ import pandas as pd
 sys.path.append(str(Path(__file__).resolve().parent.parent / "silver"))
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 
-from utils.helper_functions import logger
+from utils.helper_functions import logger, read_table, table_path, write_table
+from utils.instrumentation import instrumented
+from utils.scd2 import apply_scd2_changes, scd2_changes
 
 from transform_customers_data import transform_customers_data
 
-# Load customers
-customers_df = transform_customers_data()
-
 # Output path
-output_path = (
-    Path(__file__).resolve().parent.parent.parent
-    / "processed_data"
-    / "dim_customers.csv"
-)
+output_path = table_path("dim_customers")
 
 # Empty dimension definition
-dim_customer = pd.DataFrame(columns=[
+EMPTY_DIM_CUSTOMER = pd.DataFrame(columns=[
     "customer_key",
     "customer_id",
     "country",
@@ -30,27 +25,34 @@ dim_customer = pd.DataFrame(columns=[
     "effective_to",
     "is_current"
 ])
+dim_customer = EMPTY_DIM_CUSTOMER
+
+# Attributes whose changes open a new customer version
+TRACKED_COLUMNS = ["country"]
 
 
 def scd2_upsert_customer(
     dim_customer: pd.DataFrame,
     stg_customers: pd.DataFrame,
-    run_date: pd.Timestamp | None = None
+    run_date: pd.Timestamp | None = None,
+    tracked_columns=TRACKED_COLUMNS,
+    change_date_column: str | None = None
 ) -> pd.DataFrame:
     """
     Perform SCD Type 2 upsert for customer dimension.
+
+    Changes to ``tracked_columns`` open a new version. With ``change_date_column``
+    the staging data may hold several snapshots per customer, applied in date order.
     """
 
     run_date = run_date or pd.Timestamp.today().normalize()
 
-    # Ensure uniqueness of business key
-    stg_customers = stg_customers.drop_duplicates(subset=["customer_id"]).copy()
-
     # ------------------------------------------------------------------
     # CASE 1: Initial load
     # ------------------------------------------------------------------
-    if dim_customer.empty:
-        inserts = stg_customers.copy()
+    if dim_customer.empty and change_date_column is None:
+        # Ensure uniqueness of business key
+        inserts = stg_customers.drop_duplicates(subset=["customer_id"]).copy()
 
         inserts["customer_key"] = range(1, len(inserts) + 1)
         inserts["effective_from"] = inserts["signup_date"]
@@ -77,67 +79,26 @@ def scd2_upsert_customer(
         return result
 
     # ------------------------------------------------------------------
-    # CASE 2: Incremental SCD2
+    # CASE 2: Incremental SCD2 (hash comparison, only changed rows touched)
     # ------------------------------------------------------------------
-    dim_current = dim_customer[dim_customer["is_current"]].copy()
-
-    merged = stg_customers.merge(
-        dim_current,
-        on="customer_id",
-        how="left",
-        suffixes=("_stg", "_dim")
-    )
-
-    is_new = merged["customer_key"].isna()
-
-    country_changed = (
-        merged["country_stg"].fillna("") != merged["country_dim"].fillna("")
+    if dim_customer.empty:
+        dim_customer = EMPTY_DIM_CUSTOMER.astype({"customer_key": "int64", "is_current": bool})
+
+    expired, inserts = scd2_changes(
+        dim_customer,
+        stg_customers,
+        business_key="customer_id",
+        surrogate_key="customer_key",
+        tracked_columns=tracked_columns,
+        run_date=run_date,
+        change_date_column=change_date_column
     )
 
-    is_changed = ~is_new & country_changed
-
-    # ------------------------------------------------------------------
-    # Expire changed records
-    # ------------------------------------------------------------------
-    keys_to_expire = merged.loc[is_changed, "customer_key"]
-
-    if not keys_to_expire.empty:
-        dim_customer.loc[
-            dim_customer["customer_key"].isin(keys_to_expire),
-            ["effective_to", "is_current"]
-        ] = [run_date, False]
-
-        expired = dim_customer.loc[
-            dim_customer["customer_key"].isin(keys_to_expire)
-        ]
-
-        assert expired["effective_to"].notna().all()
-        assert not expired["is_current"].any()
-
-    # ------------------------------------------------------------------
-    # Insert new & changed records
-    # ------------------------------------------------------------------
-    inserts = merged.loc[is_new | is_changed, [
-        "customer_id",
-        "country_stg",
-        "signup_date_stg"
-    ]].rename(columns={
-        "country_stg": "country",
-        "signup_date_stg": "signup_date"
-    })
-
     if inserts.empty:
         return dim_customer
 
     logger.info(f"Inserting {len(inserts)} new/changed records into dim_customer...")
-    next_key = dim_customer["customer_key"].max() + 1
-
-    inserts["customer_key"] = range(next_key, next_key + len(inserts))
-    inserts["effective_from"] = run_date
-    inserts["effective_to"] = pd.NaT
-    inserts["is_current"] = True
-
-    dim_customer = pd.concat([dim_customer, inserts], ignore_index=True)
+    dim_customer = apply_scd2_changes(dim_customer, expired, inserts, surrogate_key="customer_key")
 
     # Final integrity checks
     assert dim_customer["customer_key"].is_unique
@@ -152,9 +113,33 @@ def scd2_upsert_customer(
     return dim_customer
 
 
-# Run SCD2
-dim_customer = scd2_upsert_customer(dim_customer, customers_df)
+@instrumented()
+def build_dim_customer(transform_customers_fn, current_dim: pd.DataFrame | None = None):
+    # Prepare customers
+    customers_df = transform_customers_fn()
+
+    # Start from the empty dimension unless an existing one is handed in
+    dim_customer = current_dim if current_dim is not None else EMPTY_DIM_CUSTOMER
+
+    # Run SCD2
+    dim_customer = scd2_upsert_customer(dim_customer, customers_df)
+
+    # Save, unless the upsert found nothing to expire or insert. The whole
+    # dimension is rewritten: it is a single (unpartitioned) file
+    if dim_customer is not current_dim:
+        write_table(dim_customer, "dim_customers")
+
+    return dim_customer
+
+
+def load_dim_customer() -> pd.DataFrame:
+    # Read the persisted dimension table back with its types
+    return read_table("dim_customers")
+
+
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["customers"])
 
-# Save
-dim_customer.to_csv(output_path, index=False)
-# print(dim_customer.info())
@@ -8,17 +8,15 @@ sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 
 from transform_transactiions_data import transform_transactions_data
 
-from utils.helper_functions import logger
+from utils.helper_functions import logger, read_table, table_path, write_table
+from utils.instrumentation import instrumented
 
 # Output path for the dimension table
-output_path = (
-    Path(__file__).resolve().parent.parent.parent
-    / "processed_data"
-    / "dim_dates.csv"
-)
+output_path = table_path("dim_dates")
 
 
-def build_dim_date(transform_transactions_fn):
+@instrumented()
+def build_dim_date(transform_transactions_fn, write: bool = True):
     # Load and prepare transactions
     transactions_df = transform_transactions_fn()
     
@@ -74,16 +72,27 @@ def build_dim_date(transform_transactions_fn):
         ]
     ]
 
-    # Save dimension table to CSV
-    logger.info(f"Saving dim_date dimension table to {output_path}...")
-    dim_date.to_csv(output_path, index=False)
+    # Save dimension table
+    if write:
+        logger.info(f"Saving dim_date dimension table to {output_path}...")
+        write_table(dim_date, "dim_dates")
 
     return dim_date
 
 
+def load_dim_date() -> pd.DataFrame:
+    # Read the persisted dimension table back with its types
+    # ("date" holds plain dates so it joins on transaction_timestamp.dt.date)
+    return read_table("dim_dates")
+
+
 # Build the dimension table and save it to CSV
 
-dim_date = build_dim_date(transform_transactions_data)
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["dates"])
 # print(dim_date.head())
 # print(len(dim_date))
 # print(dim_date.info())
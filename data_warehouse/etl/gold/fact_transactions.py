@@ -1,8 +1,10 @@
+import json
 import sys
 from pathlib import Path
 import pandas as pd
 
 # Add parent directory to sys.path
+sys.path.append(str(Path(__file__).resolve().parent))
 sys.path.append(str(Path(__file__).resolve().parent.parent / "silver"))
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 
@@ -10,31 +12,109 @@ sys.path.append(str(Path(__file__).resolve().parent.parent.parent / ""))
 from transform_transactiions_data import transform_transactions_data
 from transform_customers_data import transform_customers_data
 
-from utils.helper_functions import logger
+from utils.helper_functions import logger, table_exists, table_path, write_table
+from utils.instrumentation import instrumented
+from utils.scd2 import point_in_time_join
+
+from dim_customers import build_dim_customer, load_dim_customer
+from dim_currency import build_dim_currency, load_dim_currency
+from dim_category import build_dim_category, load_dim_category
+from dim_dates import build_dim_date, load_dim_date
 
 # Define output path at module level
-output_path = (
-    Path(__file__).resolve().parent.parent.parent
-    / "processed_data"
-    / "fact_transactions.csv"
-)
+output_path = table_path("fact_transactions")
+
+# Customer-key validation report, written next to the fact table
+VALIDATION_REPORT_NAME = "_fact_transactions_validation.json"
+
+
+def validate_customer_keys(
+    fact_transactions: pd.DataFrame,
+    dim_customer: pd.DataFrame,
+    sample_size: int = 20,
+) -> dict:
+    """
+    Report how the fact rows resolved against the customer versions:
+    unmatched facts (unknown customer, dated before the customer's first
+    version, or outside every version) and late-arriving facts (matched to a
+    version that is no longer current).
+    """
+
+    unmatched = fact_transactions["customer_key"].isna()
+    known = fact_transactions["customer_id"].isin(dim_customer["customer_id"])
+
+    first_version = dim_customer.groupby("customer_id")["effective_from"].min()
+    before_first = (
+        fact_transactions["transaction_timestamp"]
+        < fact_transactions["customer_id"].map(first_version)
+    )
+
+    current_keys = dim_customer.loc[dim_customer["is_current"].astype(bool), "customer_key"]
+    late_arriving = ~unmatched & ~fact_transactions["customer_key"].isin(current_keys)
+
+    report = {
+        "facts": len(fact_transactions),
+        "matched": int((~unmatched).sum()),
+        "unmatched": int(unmatched.sum()),
+        "unknown_customer": int((unmatched & ~known).sum()),
+        "before_first_version": int((unmatched & known & before_first).sum()),
+        "outside_any_version": int((unmatched & known & ~before_first).sum()),
+        "late_arriving": int(late_arriving.sum()),
+        "unmatched_sample": fact_transactions.loc[unmatched, "transaction_id"].head(sample_size).tolist(),
+    }
+
+    logger.info(
+        f"customer_key resolved for {report['matched']}/{report['facts']} transactions "
+        f"({report['late_arriving']} late-arriving, matched to a past customer version)"
+    )
+    if report["unmatched"]:
+        logger.warning(
+            f"{report['unmatched']} transactions have no valid customer version: "
+            f"{report['unknown_customer']} unknown customers, "
+            f"{report['before_first_version']} before the customer's first version, "
+            f"{report['outside_any_version']} outside every version"
+        )
+    return report
 
 
 
+@instrumented()
 def build_fact_transactions(
     transform_transactions_fn,
     transform_customers_fn,
     output_path: Path,
+    dim_customer: pd.DataFrame | None = None,
+    dim_currency: pd.DataFrame | None = None,
+    dim_category: pd.DataFrame | None = None,
+    dim_date: pd.DataFrame | None = None,
+    write: bool = True,
 ):
     # Load transformed data
     transactions_df = transform_transactions_fn()
     customers_df = transform_customers_fn()
 
-    # Import dimension tables (assumed to be available in the current namespace)
-    from dim_customers import dim_customer
-    from dim_currency import dim_currency
-    from dim_category import dim_category
-    from dim_dates import dim_date
+    # Reuse the already-built dimension tables for any that were not handed
+    # in by the caller, and only build the ones that were never persisted
+    if dim_customer is None:
+        dim_customer = (
+            load_dim_customer() if table_exists("dim_customers")
+            else build_dim_customer(lambda: customers_df)
+        )
+    if dim_currency is None:
+        dim_currency = (
+            load_dim_currency() if table_exists("dim_currencies")
+            else build_dim_currency(lambda: transactions_df)
+        )
+    if dim_category is None:
+        dim_category = (
+            load_dim_category() if table_exists("dim_categories")
+            else build_dim_category(lambda: transactions_df)
+        )
+    if dim_date is None:
+        dim_date = (
+            load_dim_date() if table_exists("dim_dates")
+            else build_dim_date(lambda: transactions_df)
+        )
 
     # Ensure timestamp is datetime
     # transactions_df["timestamp"] = pd.to_datetime(transactions_df["timestamp"])
@@ -49,19 +129,31 @@ def build_fact_transactions(
     # Add a transaction date column
     transactions_df["transaction_date"] = transactions_df["transaction_timestamp"].dt.date
 
+    # Calendar attributes (as in dim_dates) used to partition the stored fact table
+    transactions_df["transaction_year"] = transactions_df["transaction_timestamp"].dt.year.astype("Int64")
+    transactions_df["transaction_month"] = transactions_df["transaction_timestamp"].dt.month.astype("Int64")
+
     # High‑value transaction flag (> 500 EUR)
     transactions_df["is_high_value_transaction"] = (
         transactions_df["transaction_amount_eur"] > 500
     ).astype(int)
 
-    # Merge dimension keys into the fact table
+    # Attach the customer version valid at the transaction time (SCD2 as-of
+    # lookup: one customer_key per transaction, no fan-out over the history).
+    # Transactions no version covers keep an empty customer_key.
+    transactions_df = point_in_time_join(
+        transactions_df,
+        dim_customer,
+        "customer_id",
+        "transaction_timestamp",
+        columns=["customer_key"],
+        how="left",
+    )
+    transactions_df["customer_key"] = transactions_df["customer_key"].astype("Int64")
+
+    # Merge the other dimension keys into the fact table
     transactions_df = (
         transactions_df
-        .merge(
-            dim_customer[["customer_id", "customer_key"]],
-            on="customer_id",
-            how="left",
-        )
         .merge(
             dim_currency[["transaction_currency", "currency_key"]],
             on="transaction_currency",
@@ -94,11 +186,20 @@ def build_fact_transactions(
         "transaction_amount_eur",
         "current_exchange_rate",
         "is_high_value_transaction",
+        "transaction_year",
+        "transaction_month",
     ]]
 
-    # Store data as CSV
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    fact_transactions.to_csv(output_path, index=False)
+    # Check the SCD2 customer_key resolution
+    report = validate_customer_keys(fact_transactions, dim_customer)
+
+    # Callers streaming the fact table in chunks persist it themselves
+    if not write:
+        return fact_transactions
+
+    # Store data in the configured table format
+    write_table(fact_transactions, output_path.stem, directory=output_path.parent)
+    (output_path.parent / VALIDATION_REPORT_NAME).write_text(json.dumps(report, indent=2))
 
 
     logger.info(f"Fact table 'fact_transactions' built successfully with shape {fact_transactions.shape} and saved to {output_path}.")
@@ -106,11 +207,11 @@ def build_fact_transactions(
 
 
 # Usage & Quality checks
-fact_transactions = build_fact_transactions(
-    transform_transactions_data,
-    transform_customers_data,
-    output_path,
-)
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from pipeline import main
+
+    main(default_only=["fact"])
 # print(fact_transactions.head())
 # print(fact_transactions.columns.tolist())
 # print(len(fact_transactions))
\ No newline at end of file
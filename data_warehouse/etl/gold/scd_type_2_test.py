@@ -1,7 +1,11 @@
 import pandas as pd
-from dim_customers import scd2_upsert_customer, dim_customer,customers_df
+from dim_customers import scd2_upsert_customer, dim_customer
+from transform_customers_data import transform_customers_data
 import os
 
+# Initial load of the customer dimension
+dim_customer = scd2_upsert_customer(dim_customer, transform_customers_data())
+
 DATA_DIR = "../../raw_data"
 customers = pd.read_csv(os.path.join(DATA_DIR, "customers.csv"))
 
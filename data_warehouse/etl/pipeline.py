@@ -0,0 +1,620 @@
+"""
+Single-pass ETL pipeline for the data warehouse.
+
+Runs bronze (extract) and silver (transform) exactly once and hands the
+in-memory DataFrames to every gold builder, instead of letting each gold
+module re-extract and re-clean the raw files on its own.
+
+Stages are declared as a small DAG (name, upstream stages, callable) and
+executed in dependency order. Each stage reports its wall time, rows in/out,
+bytes read/written and peak memory (utils.instrumentation), which can be
+exported as JSON lines (--metrics-jsonl) or a Prometheus textfile
+(--metrics-textfile).
+
+run_streaming_pipeline is the bounded-memory variant for raw files larger
+than RAM: bronze is read in chunks and flows through the silver transforms
+as a generator, and the fact table is built and written chunk by chunk.
+
+run_incremental_pipeline only processes bronze rows at or after the last
+loaded transaction timestamp (the watermark) and merges them into the
+existing gold tables.
+
+Usage:
+    python data_warehouse/etl/pipeline.py
+    python data_warehouse/etl/pipeline.py --chunksize 500000
+    python data_warehouse/etl/pipeline.py --incremental
+    python -m data_warehouse.etl.gold.fact_transactions --only fact
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add the layer directories and the data_warehouse root to sys.path
+sys.path.append(str(Path(__file__).resolve().parent / "bronze"))
+sys.path.append(str(Path(__file__).resolve().parent / "silver"))
+sys.path.append(str(Path(__file__).resolve().parent / "gold"))
+sys.path.append(str(Path(__file__).resolve().parent.parent / ""))
+
+from extract_data import (
+    extract_data,
+    extract_customers_chunks,
+    extract_transactions_chunks,
+    DEFAULT_CHUNKSIZE,
+)
+from transform_customers_data import transform_customers_data
+from transform_transactiions_data import (
+    transform_transactions_data,
+    stream_transactions_data,
+    DEFAULT_PARTITIONS,
+)
+from dim_category import build_dim_category, load_dim_category
+from dim_currency import build_dim_currency, load_dim_currency
+from dim_dates import build_dim_date, load_dim_date
+from dim_customers import build_dim_customer, load_dim_customer
+from fact_transactions import build_fact_transactions, output_path as fact_output_path
+from agg_customer_metrics import (
+    aggregate_customer_metrics,
+    build_agg_customer_metrics,
+    combine_customer_metrics,
+    refresh_agg_customer_metrics,
+)
+
+from utils.helper_functions import (
+    logger,
+    DATE_PARTITION_COLUMNS,
+    TableAppender,
+    read_table,
+    read_watermark,
+    table_exists,
+    write_partitions,
+    write_table,
+    write_watermark,
+)
+from utils.instrumentation import configure as configure_metrics, pipeline_run, run_stage
+
+
+def _build_fact(transactions_df, customers_df, dim_customer, dim_currency, dim_category, dim_date):
+    return build_fact_transactions(
+        lambda: transactions_df,
+        lambda: customers_df,
+        fact_output_path,
+        dim_customer=dim_customer,
+        dim_currency=dim_currency,
+        dim_category=dim_category,
+        dim_date=dim_date,
+    )
+
+
+# Pipeline DAG: (stage name, upstream stages, callable taking the upstream outputs)
+PIPELINE_STAGES = [
+    ("extract", (), extract_data),
+    ("silver_customers", ("extract",), lambda raw: transform_customers_data(raw[0])),
+    ("silver_transactions", ("extract",), lambda raw: transform_transactions_data(raw[1])),
+    ("dim_category", ("silver_transactions",), lambda txn: build_dim_category(lambda: txn)),
+    ("dim_currency", ("silver_transactions",), lambda txn: build_dim_currency(lambda: txn)),
+    ("dim_date", ("silver_transactions",), lambda txn: build_dim_date(lambda: txn)),
+    ("dim_customer", ("silver_customers",), lambda customers: build_dim_customer(lambda: customers)),
+    (
+        "fact_transactions",
+        (
+            "silver_transactions",
+            "silver_customers",
+            "dim_customer",
+            "dim_currency",
+            "dim_category",
+            "dim_date",
+        ),
+        _build_fact,
+    ),
+    (
+        "agg_customer_metrics",
+        ("fact_transactions", "dim_category"),
+        lambda fact, category: build_agg_customer_metrics(fact, category),
+    ),
+]
+
+
+# Gold tables that can be read back from processed_data instead of rebuilt
+GOLD_LOADERS = {
+    "dim_category": load_dim_category,
+    "dim_currency": load_dim_currency,
+    "dim_date": load_dim_date,
+    "dim_customer": load_dim_customer,
+    "fact_transactions": lambda: read_table("fact_transactions"),
+}
+
+# Short names accepted by --only
+STAGE_ALIASES = {
+    "category": "dim_category",
+    "currency": "dim_currency",
+    "dates": "dim_date",
+    "customers": "dim_customer",
+    "fact": "fact_transactions",
+    "metrics": "agg_customer_metrics",
+}
+
+
+def _plan(stages, only):
+    """
+    Decide which stages to run and which gold dependencies to load from disk.
+
+    Selected stages and their bronze/silver ancestors are run; gold
+    dependencies that were not selected are read from processed_data.
+    """
+
+    upstream_of = {name: upstream for name, upstream, _ in stages}
+    targets = [STAGE_ALIASES.get(name, name) for name in only]
+
+    unknown = [name for name in targets if name not in upstream_of]
+    if unknown:
+        raise ValueError(f"Unknown pipeline stages: {unknown}")
+
+    to_run, to_load = set(), set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in to_run:
+            continue
+        to_run.add(name)
+        for dep in upstream_of[name]:
+            if dep in GOLD_LOADERS and dep not in targets:
+                to_load.add(dep)
+            else:
+                pending.append(dep)
+
+    return to_run, to_load
+
+
+def _log_report(report, total):
+    logger.info(f"Pipeline finished in {total:.2f}s")
+    for entry in report:
+        rows_in = "" if entry["rows_in"] is None else entry["rows_in"]
+        rows_out = "" if entry["rows_out"] is None else entry["rows_out"]
+        logger.info(
+            f"  {entry['stage']:<20} {entry['seconds']:>8.3f}s {rows_in:>10} -> {rows_out:>10} rows "
+            f"{entry['bytes_read'] / 2**20:>9.1f} MB read {entry['bytes_written'] / 2**20:>9.1f} MB written "
+            f"{entry['peak_rss_bytes'] / 2**20:>7.0f} MB peak RSS"
+        )
+
+
+@pipeline_run("full")
+def run_pipeline(stages=PIPELINE_STAGES, only=None):
+    """
+    Run the ETL DAG once, in dependency order.
+
+    ``only`` restricts the run to the given stages (full names or the short
+    aliases in STAGE_ALIASES); gold tables they depend on are reused from
+    processed_data instead of being rebuilt.
+
+    Returns a tuple ``(outputs, report)`` where ``outputs`` maps each stage name
+    to its result and ``report`` lists the metrics of each stage (wall time,
+    rows in/out, bytes read/written, peak RSS; see utils.instrumentation).
+    """
+
+    if only:
+        to_run, to_load = _plan(stages, only)
+    else:
+        to_run, to_load = {name for name, _, _ in stages}, set()
+
+    outputs = {}
+    report = []
+    pipeline_start = time.perf_counter()
+
+    for name, upstream, stage_fn in stages:
+        if name not in to_run and name not in to_load:
+            continue
+
+        missing = [dep for dep in upstream if dep not in outputs]
+        if name in to_run and missing:
+            raise ValueError(f"Stage '{name}' depends on stages that have not run: {missing}")
+
+        if name in to_load:
+            logger.info(f"=====Loading stage '{name}' from processed_data=====")
+            outputs[name] = run_stage(name, GOLD_LOADERS[name], report)
+        else:
+            logger.info(f"=====Running stage '{name}'=====")
+            inputs = [outputs[dep] for dep in upstream]
+            outputs[name] = run_stage(name, lambda: stage_fn(*inputs), report)
+
+    if "fact_transactions" in to_run:
+        write_watermark("fact_transactions", outputs["fact_transactions"]["transaction_timestamp"].max())
+
+    _log_report(report, time.perf_counter() - pipeline_start)
+    return outputs, report
+
+
+def _rebatch(batches, rows):
+    """
+    Regroup record batches into DataFrames of about ``rows`` rows (the batches
+    of a spill file never span its row groups, which can be much smaller).
+    """
+
+    pending, pending_rows = [], 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= rows:
+            yield pa.Table.from_batches(pending).to_pandas()
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+# Transaction columns the dimension builders need in streaming mode
+DIMENSION_COLUMNS = [
+    "category",
+    "transaction_currency",
+    "base_currency",
+    "currency_imputed",
+    "transaction_timestamp",
+    "date",
+]
+
+
+@pipeline_run("streaming")
+def run_streaming_pipeline(chunksize=DEFAULT_CHUNKSIZE, partitions=DEFAULT_PARTITIONS):
+    """
+    Run the ETL with bounded memory, for raw files larger than RAM.
+
+    Transactions are read in chunks of ``chunksize`` rows and streamed through
+    the silver transforms into a temporary Parquet spill. The dimensions only
+    see the distinct category/currency/date combinations, and the fact table is
+    built and appended one spilled batch at a time.
+
+    Returns a tuple ``(outputs, report)`` like run_pipeline; the fact table is
+    reported by row count only, as it is never held in memory as a whole.
+    """
+
+    outputs = {}
+    report = []
+    pipeline_start = time.perf_counter()
+
+    # Customers are small enough to transform in one piece once streamed in
+    outputs["silver_customers"] = run_stage(
+        "silver_customers",
+        lambda: transform_customers_data(
+            pd.concat(extract_customers_chunks(chunksize), ignore_index=True)
+        ),
+        report,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spill_dir = Path(tmp)
+
+        def stream_silver():
+            # Spill silver chunks to disk, keeping only what the dimensions need
+            projections = []
+            with TableAppender("silver_transactions", fmt="parquet", export_csv=False, directory=spill_dir) as appender:
+                chunks = stream_transactions_data(extract_transactions_chunks(chunksize), partitions)
+                for chunk in chunks:
+                    appender.append(chunk)
+                    projections.append(
+                        chunk[DIMENSION_COLUMNS]
+                        .drop_duplicates(subset=["category", "transaction_currency", "date"])
+                    )
+            outputs["dimension_input"] = pd.concat(projections, ignore_index=True)
+            return appender.rows
+
+        run_stage("silver_transactions", stream_silver, report)
+
+        dimension_input = outputs.pop("dimension_input")
+        outputs["dim_category"] = run_stage(
+            "dim_category", lambda: build_dim_category(lambda: dimension_input), report
+        )
+        outputs["dim_currency"] = run_stage(
+            "dim_currency", lambda: build_dim_currency(lambda: dimension_input), report
+        )
+        outputs["dim_date"] = run_stage(
+            "dim_date", lambda: build_dim_date(lambda: dimension_input), report
+        )
+        outputs["dim_customer"] = run_stage(
+            "dim_customer",
+            lambda: build_dim_customer(lambda: outputs["silver_customers"]),
+            report,
+        )
+
+        def stream_fact():
+            silver_file = pq.ParquetFile(spill_dir / "silver_transactions.parquet")
+            # Batches spread over every month: merge each partition's files at the end
+            with TableAppender(
+                fact_output_path.stem, directory=fact_output_path.parent, compact_rows=chunksize
+            ) as appender:
+                for transactions_df in _rebatch(silver_file.iter_batches(batch_size=chunksize), chunksize):
+                    fact_batch = build_fact_transactions(
+                        lambda: transactions_df,
+                        lambda: outputs["silver_customers"],
+                        fact_output_path,
+                        dim_customer=outputs["dim_customer"],
+                        dim_currency=outputs["dim_currency"],
+                        dim_category=outputs["dim_category"],
+                        dim_date=outputs["dim_date"],
+                        write=False,
+                    )
+                    appender.append(fact_batch)
+                    # Latest loaded transaction, for the watermark
+                    latest_timestamps.append(fact_batch["transaction_timestamp"].max())
+                    # The customer aggregates are additive: keep one partial per batch
+                    metric_parts.append(aggregate_customer_metrics(fact_batch, outputs["dim_category"]))
+            return appender.rows
+
+        metric_parts, latest_timestamps = [], []
+        outputs["fact_transactions"] = run_stage("fact_transactions", stream_fact, report)
+        outputs["agg_customer_metrics"] = run_stage(
+            "agg_customer_metrics", lambda: combine_customer_metrics(metric_parts), report
+        )
+
+    latest_timestamp = pd.Series(latest_timestamps, dtype="datetime64[ns]").max()
+    if pd.notna(latest_timestamp):
+        write_watermark("fact_transactions", latest_timestamp)
+
+    _log_report(report, time.perf_counter() - pipeline_start)
+    return outputs, report
+
+
+# Re-read this much history before the watermark to catch late-arriving rows
+DEFAULT_LOOKBACK_DAYS = 1
+
+
+def _extract_new_transactions(cutoff, chunksize):
+    # Stream bronze and keep only the rows at or after the cutoff
+    new_rows = [
+        chunk[chunk["timestamp"] >= cutoff]
+        for chunk in extract_transactions_chunks(chunksize)
+    ]
+    return pd.concat(new_rows, ignore_index=True)
+
+
+def _drop_already_loaded(transactions_df):
+    """
+    Apply the "keep latest timestamp per transaction_id" rule against the facts
+    that are already loaded: keep a new row only if its transaction_id is new or
+    its timestamp is later than the loaded version.
+    """
+
+    ids = transactions_df["transaction_id"].dropna().astype("int64").unique().tolist()
+    loaded = read_table(
+        "fact_transactions",
+        columns=["transaction_id", "transaction_timestamp"],
+        filters=[("transaction_id", "in", ids)],
+    ).rename(columns={"transaction_timestamp": "loaded_timestamp"})
+
+    merged = transactions_df.merge(loaded, on="transaction_id", how="left")
+    is_newer = merged["loaded_timestamp"].isna() | (
+        merged["transaction_timestamp"] > merged["loaded_timestamp"]
+    )
+
+    logger.info(
+        f"{int(is_newer.sum())} of {len(merged)} new transactions are not loaded yet "
+        f"({int(merged['loaded_timestamp'].notna().sum())} already have a loaded version)"
+    )
+    return transactions_df[is_newer.to_numpy()].reset_index(drop=True)
+
+
+def _extend_dimension(existing, candidates, natural_key, surrogate_key):
+    """
+    Append the members of ``candidates`` that ``existing`` does not know yet,
+    with new surrogate keys, so keys already referenced by facts stay stable.
+    """
+
+    new_members = candidates[~candidates[natural_key].isin(existing[natural_key])].copy()
+    next_key = int(existing[surrogate_key].max()) + 1 if len(existing) else 1
+    new_members[surrogate_key] = range(next_key, next_key + len(new_members))
+
+    logger.info(f"Adding {len(new_members)} new members to dimension keyed by '{natural_key}'")
+    return pd.concat([existing, new_members[existing.columns]], ignore_index=True)
+
+
+def _partition_keys(df):
+    # Distinct (year, month) partitions of a fact frame
+    return set(
+        tuple(None if pd.isna(value) else int(value) for value in values)
+        for values in df[DATE_PARTITION_COLUMNS].drop_duplicates().itertuples(index=False)
+    )
+
+
+def _merge_fact(delta_fact):
+    """
+    Merge the delta into the partitioned fact table: only the partitions that
+    receive new rows or hold superseded versions of them are rewritten.
+
+    Returns the superseded fact rows.
+    """
+
+    ids = delta_fact["transaction_id"].dropna().astype("int64").unique().tolist()
+    superseded = read_table(
+        "fact_transactions",
+        columns=["transaction_id", *DATE_PARTITION_COLUMNS],
+        filters=[("transaction_id", "in", ids)],
+    )
+    affected = _partition_keys(delta_fact) | _partition_keys(superseded)
+
+    existing = read_table(
+        "fact_transactions",
+        partition_filter=lambda values: tuple(values.get(c) for c in DATE_PARTITION_COLUMNS) in affected,
+    )
+    is_superseded = existing["transaction_id"].isin(ids)
+
+    merged = pd.concat([existing[~is_superseded], delta_fact], ignore_index=True)
+    write_partitions(merged, "fact_transactions", affected)
+    return existing[is_superseded]
+
+
+@pipeline_run("incremental")
+def run_incremental_pipeline(lookback_days=DEFAULT_LOOKBACK_DAYS, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Load only the transactions that arrived since the last run.
+
+    Bronze rows with a timestamp at or after the watermark (minus
+    ``lookback_days``) are transformed, deduplicated against the loaded facts,
+    and merged into the existing gold tables; dimension keys of existing
+    members never change. Falls back to a full run when nothing was loaded yet.
+    """
+
+    watermark = read_watermark("fact_transactions")
+    if watermark is None or not table_exists("fact_transactions"):
+        logger.info("No watermark found for fact_transactions, running a full load...")
+        return run_pipeline()
+
+    cutoff = watermark - pd.Timedelta(days=lookback_days)
+    logger.info(f"Incremental load of transactions since {cutoff} (watermark {watermark})")
+
+    outputs = {}
+    report = []
+    pipeline_start = time.perf_counter()
+
+    outputs["extract"] = run_stage(
+        "extract", lambda: _extract_new_transactions(cutoff, chunksize), report
+    )
+
+    next_key = int(read_table("fact_transactions", columns=["transaction_key"])["transaction_key"].max()) + 1
+    outputs["silver_transactions"] = run_stage(
+        "silver_transactions",
+        lambda: _drop_already_loaded(transform_transactions_data(outputs["extract"], first_key=next_key)),
+        report,
+    )
+
+    delta = outputs["silver_transactions"]
+    if delta.empty:
+        logger.info("No new transactions since the last load.")
+        _log_report(report, time.perf_counter() - pipeline_start)
+        return outputs, report
+
+    # Only the customers file is read again: transactions come from the delta scan
+    outputs["silver_customers"] = run_stage(
+        "silver_customers",
+        lambda: transform_customers_data(
+            pd.concat(extract_customers_chunks(chunksize), ignore_index=True)
+        ),
+        report,
+    )
+
+    dimensions = [
+        ("dim_category", "dim_categories", build_dim_category, load_dim_category, "category", "category_key"),
+        ("dim_currency", "dim_currencies", build_dim_currency, load_dim_currency, "transaction_currency", "currency_key"),
+        ("dim_date", "dim_dates", build_dim_date, load_dim_date, "date", "date_key"),
+    ]
+    for stage, table, build_fn, load_fn, natural_key, surrogate_key in dimensions:
+        def extend(build_fn=build_fn, load_fn=load_fn, table=table, natural_key=natural_key, surrogate_key=surrogate_key):
+            dimension = _extend_dimension(
+                load_fn(), build_fn(lambda: delta, write=False), natural_key, surrogate_key
+            )
+            write_table(dimension, table)
+            return dimension
+
+        outputs[stage] = run_stage(stage, extend, report)
+
+    # SCD2 upsert of the current customer snapshot against the loaded dimension
+    outputs["dim_customer"] = run_stage(
+        "dim_customer",
+        lambda: build_dim_customer(lambda: outputs["silver_customers"], current_dim=load_dim_customer()),
+        report,
+    )
+
+    def merge_fact():
+        delta_fact = build_fact_transactions(
+            lambda: delta,
+            lambda: outputs["silver_customers"],
+            fact_output_path,
+            dim_customer=outputs["dim_customer"],
+            dim_currency=outputs["dim_currency"],
+            dim_category=outputs["dim_category"],
+            dim_date=outputs["dim_date"],
+            write=False,
+        )
+        outputs["superseded_facts"] = _merge_fact(delta_fact)
+        return delta_fact
+
+    outputs["fact_transactions"] = run_stage("fact_transactions", merge_fact, report)
+
+    # Add the new facts to the customer aggregates and subtract the replaced ones
+    outputs["agg_customer_metrics"] = run_stage(
+        "agg_customer_metrics",
+        lambda: refresh_agg_customer_metrics(
+            outputs["fact_transactions"], outputs.pop("superseded_facts"), outputs["dim_category"]
+        ),
+        report,
+    )
+
+    write_watermark("fact_transactions", max(watermark, delta["transaction_timestamp"].max()))
+
+    _log_report(report, time.perf_counter() - pipeline_start)
+    return outputs, report
+
+
+def main(argv=None, default_only=None):
+    """
+    Command line entry point shared by the pipeline and the gold modules.
+    """
+
+    parser = argparse.ArgumentParser(description="Run the data warehouse ETL pipeline.")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        default=default_only,
+        metavar="STAGE",
+        help=(
+            "Only build the given stages "
+            f"({', '.join(STAGE_ALIASES)} or full stage names); "
+            "gold dependencies are read from processed_data."
+        ),
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream the raw files in chunks of this many rows (bounded memory mode).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only load transactions that arrived since the last run (watermark based).",
+    )
+    parser.add_argument(
+        "--lookback-days",
+        type=int,
+        default=DEFAULT_LOOKBACK_DAYS,
+        help="Days before the watermark to re-read in incremental mode, for late-arriving rows.",
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=DEFAULT_PARTITIONS,
+        help="Number of on-disk partitions used to deduplicate in streaming mode.",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        default=None,
+        help="Append the stage metrics to this JSON lines file (default: $WAREHOUSE_METRICS_JSONL).",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        default=None,
+        help="Write the stage metrics of the run to this Prometheus textfile (default: $WAREHOUSE_METRICS_TEXTFILE).",
+    )
+    args = parser.parse_args(argv)
+
+    configure_metrics(jsonl_path=args.metrics_jsonl, textfile_path=args.metrics_textfile)
+
+    if args.incremental:
+        if args.only:
+            parser.error("--only cannot be combined with --incremental")
+        run_incremental_pipeline(
+            lookback_days=args.lookback_days,
+            chunksize=args.chunksize or DEFAULT_CHUNKSIZE,
+        )
+    elif args.chunksize:
+        if args.only:
+            parser.error("--only cannot be combined with --chunksize")
+        run_streaming_pipeline(chunksize=args.chunksize, partitions=args.partitions)
+    else:
+        run_pipeline(only=args.only)
+
+
+if __name__ == "__main__":
+    main()
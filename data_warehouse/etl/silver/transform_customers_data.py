@@ -9,18 +9,24 @@ import pandas as pd
 
 from extract_data import extract_data
 from utils.helper_functions import standardize_columns, DuplicateDataError, logger
+from utils.instrumentation import annotate, instrumented
 
 
-def transform_customers_data() -> pd.DataFrame:
+@instrumented()
+def transform_customers_data(customers_df: pd.DataFrame | None = None) -> pd.DataFrame:
     """
     Extract and transform customer data:
     - Standardize column names
     - Convert signup_date to datetime
     - Remove duplicate customers, keeping the latest signup_date
+
+    When ``customers_df`` is given (e.g. by the pipeline runner), it is used
+    instead of extracting the raw customers file again.
     """
 
-    logger.info("Retrieving customer data...")
-    customers_df, _ = extract_data()
+    if customers_df is None:
+        logger.info("Retrieving customer data...")
+        customers_df, _ = extract_data()
 
     logger.info("Standardizing customer data columns...")
     customers_df = standardize_columns(customers_df)
@@ -32,8 +38,9 @@ def transform_customers_data() -> pd.DataFrame:
     )
 
     logger.info("Checking for null values...")
-    null_counts = customers_df.isnull().sum()
-    logger.info(f"Null value summary:\n{null_counts}")
+    null_counts = {column: int(count) for column, count in customers_df.isnull().sum().items() if count}
+    annotate(null_counts=null_counts)
+    logger.info(f"Null values per column: {null_counts}")
 
     duplicate_customers = customers_df.duplicated(subset=["customer_id"]).sum()
     logger.info(f"Found {duplicate_customers} duplicate customer_id values before deduplication.")
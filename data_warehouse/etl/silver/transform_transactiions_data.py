@@ -1,4 +1,5 @@
 import sys
+import tempfile
 from pathlib import Path
 
 # Add parent directory to sys.path
@@ -15,21 +16,18 @@ from utils.helper_functions import (
     DuplicateDataError,
     logger
 )
+from utils.instrumentation import annotate, instrumented
 
 
-def transform_transactions_data() -> pd.DataFrame:
-    """
-    Extract and transform transactions data:
-    - Standardize columns
-    - Deduplicate transactions
-    - Clean and impute missing values
-    - Normalize currencies to EUR
-    """
+# Number of hash partitions used to deduplicate a streamed file out of core
+DEFAULT_PARTITIONS = 16
 
-    logger.info("Retrieving transactions data...")
-    _, transactions_df = extract_data()
-    logger.info(f"Initial transactions shape: {transactions_df.shape}")
-    
+# Low-cardinality columns kept as categoricals in streamed chunks
+CATEGORICAL_COLUMNS = ["category", "transaction_currency", "base_currency"]
+
+
+def _prepare_transactions(transactions_df: pd.DataFrame) -> pd.DataFrame:
+    # Row-level cleaning that does not depend on other rows
     logger.info("Standardizing column names...")
     transactions_df = standardize_columns(transactions_df)
 
@@ -48,6 +46,10 @@ def transform_transactions_data() -> pd.DataFrame:
     logger.info("Converting customer_id to Int64...")
     transactions_df["customer_id"] = transactions_df["customer_id"].astype("Int64")
 
+    return transactions_df
+
+
+def _deduplicate_transactions(transactions_df: pd.DataFrame) -> pd.DataFrame:
     # --------------------------------------------------
     # Duplicate handling
     # --------------------------------------------------
@@ -90,6 +92,10 @@ def transform_transactions_data() -> pd.DataFrame:
             f"{remaining_duplicates}"
         )
 
+    return transactions_df
+
+
+def _impute_and_normalize_transactions(transactions_df: pd.DataFrame) -> pd.DataFrame:
     # --------------------------------------------------
     # Null handling & imputations
     # --------------------------------------------------
@@ -103,13 +109,14 @@ def transform_transactions_data() -> pd.DataFrame:
     # Fill missing currency values with "EUR" and standardize the format
     transactions_df["currency"] = (
         transactions_df["currency"]
+        .astype(object)
         .fillna("EUR")
         .str.strip()
         .str.upper()
     )
 
     logger.info("Imputing missing category values to preserve transaction completeness...")
-    transactions_df["category"] = transactions_df["category"].fillna("unknown")
+    transactions_df["category"] = transactions_df["category"].astype(object).fillna("unknown")
 
     # --------------------------------------------------
     # Currency normalization
@@ -125,17 +132,14 @@ def transform_transactions_data() -> pd.DataFrame:
     # Define the base currency
     transactions_df["base_currency"] = "EUR"
 
-    # Quality check to ensure no null values remain in critical columns after transformations
-    null_summary = transactions_df.isnull().sum()
-    logger.info(f"Final null value summary:\n{null_summary}")
+    return transactions_df
 
-    logger.info(f"Final transactions shape: {transactions_df.shape}")
-    logger.info("Transactions data transformation completed successfully.")
-    
+
+def _finalize_transactions(transactions_df: pd.DataFrame, first_key: int = 1) -> pd.DataFrame:
     # --------------------------------------------------
     # Add a surrogate key for transactions for future merging with dimension tables
     # --------------------------------------------------
-    transactions_df["transaction_key"] = range(1, len(transactions_df) + 1)
+    transactions_df["transaction_key"] = range(first_key, first_key + len(transactions_df))
     
     transactions_df = transactions_df.rename(columns={
         "currency": "transaction_currency",
@@ -153,11 +157,94 @@ def transform_transactions_data() -> pd.DataFrame:
     # # Create a new 'date' column by flooring the transaction_timestamp to the nearest day
     # transactions_df["date"] = transactions_df["transaction_timestamp"].dt.floor("D")
 
-    
+    return transactions_df
+
+
+@instrumented()
+def transform_transactions_data(
+    transactions_df: pd.DataFrame | None = None,
+    first_key: int = 1,
+) -> pd.DataFrame:
+    """
+    Extract and transform transactions data:
+    - Standardize columns
+    - Deduplicate transactions
+    - Clean and impute missing values
+    - Normalize currencies to EUR
+
+    When ``transactions_df`` is given (e.g. by the pipeline runner), it is used
+    instead of extracting the raw transactions file again. ``first_key`` is the
+    first transaction_key to assign (incremental loads continue the sequence).
+    """
+
+    if transactions_df is None:
+        logger.info("Retrieving transactions data...")
+        _, transactions_df = extract_data()
+    logger.info(f"Initial transactions shape: {transactions_df.shape}")
+
+    transactions_df = _prepare_transactions(transactions_df)
+    transactions_df = _deduplicate_transactions(transactions_df)
+    transactions_df = _impute_and_normalize_transactions(transactions_df)
+
+    # Quality check to ensure no null values remain in critical columns after transformations
+    null_counts = {column: int(count) for column, count in transactions_df.isnull().sum().items() if count}
+    annotate(null_counts=null_counts)
+    logger.info(f"Final null values per column: {null_counts}")
+
+    logger.info(f"Final transactions shape: {transactions_df.shape}")
+    logger.info("Transactions data transformation completed successfully.")
+
+    transactions_df = _finalize_transactions(transactions_df, first_key=first_key)
+
     # print(transactions_df.columns)   
     # print(transactions_df.head()) 
     return transactions_df
 
 
+def stream_transactions_data(chunks, partitions: int = DEFAULT_PARTITIONS, spill_dir=None):
+    """
+    Transform a stream of raw transaction chunks (e.g. from
+    extract_transactions_chunks) and yield cleaned, deduplicated chunks.
+
+    Deduplication needs every version of a transaction_id side by side, so the
+    prepared chunks are first spilled to disk hash-partitioned on
+    transaction_id; each partition is then deduplicated and normalized on its
+    own. Peak memory is bounded by one chunk or one partition instead of the
+    whole file.
+    """
+
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        spill_root = Path(tmp)
+
+        rows_in = 0
+        for chunk_number, chunk in enumerate(chunks):
+            chunk = _prepare_transactions(chunk)
+            rows_in += len(chunk)
+
+            # Route every version of a transaction_id to the same partition
+            buckets = chunk["transaction_id"].to_numpy(dtype="int64", na_value=-1) % partitions
+            for partition, part in chunk.groupby(buckets, sort=False):
+                part_dir = spill_root / f"partition={partition:04d}"
+                part_dir.mkdir(exist_ok=True)
+                part.to_parquet(part_dir / f"chunk-{chunk_number:06d}.parquet", index=False)
+
+        logger.info(f"Spilled {rows_in} prepared transactions into {partitions} partitions")
+
+        next_key = 1
+        rows_out = 0
+        for part_dir in sorted(spill_root.iterdir()):
+            transactions_df = pd.read_parquet(part_dir)
+            transactions_df = _deduplicate_transactions(transactions_df)
+            transactions_df = _impute_and_normalize_transactions(transactions_df)
+            transactions_df = _finalize_transactions(transactions_df, first_key=next_key)
+            transactions_df[CATEGORICAL_COLUMNS] = transactions_df[CATEGORICAL_COLUMNS].astype("category")
+
+            next_key += len(transactions_df)
+            rows_out += len(transactions_df)
+            yield transactions_df
+
+        logger.info(f"Streamed {rows_out} transformed transactions (from {rows_in} raw rows)")
+
+
 if __name__ == "__main__":
     transformed_transactions = transform_transactions_data()
@@ -1,4 +1,15 @@
+import json
 import logging
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.instrumentation import add_bytes_read, add_bytes_written, path_bytes
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,3 +40,632 @@ EXCHANGE_RATES = {
 class DuplicateDataError(Exception):
     """Custom exception for duplicate data errors."""
     pass
+
+
+# =========================================
+# Processed table storage
+# =========================================
+
+# Directory holding the gold (dimension & fact) tables (overridable with
+# WAREHOUSE_PROCESSED_DATA_DIR, e.g. for benchmarks)
+PROCESSED_DATA_DIR = Path(os.getenv(
+    "WAREHOUSE_PROCESSED_DATA_DIR", Path(__file__).resolve().parent.parent / "processed_data"
+))
+
+# Storage format used for gold tables ("parquet" by default, "csv" for exports)
+TABLE_FORMAT = os.getenv("WAREHOUSE_TABLE_FORMAT", "parquet")
+
+# Also export every gold table as CSV next to the primary format
+EXPORT_CSV = os.getenv("WAREHOUSE_EXPORT_CSV", "false").lower() == "true"
+
+# Explicit schemas for the gold tables, so types survive a write/read round trip.
+# "date" stands for plain calendar dates (datetime.date values).
+TABLE_SCHEMAS = {
+    "dim_categories": {
+        "category_key": "Int64",
+        "category": "string",
+        "is_refundable": "boolean",
+        "return_window_days": "Int64",
+        "transaction_timestamp": "datetime64[ns]",
+    },
+    "dim_currencies": {
+        "currency_key": "Int64",
+        "base_currency": "string",
+        "transaction_currency": "string",
+        "currency_imputed": "boolean",
+        "conversion_type": "string",
+        "transaction_timestamp": "datetime64[ns]",
+        "exchange_rate_source": "string",
+    },
+    "dim_dates": {
+        "date_key": "Int64",
+        "date": "date",
+        "transaction_day": "Int64",
+        "transaction_month": "Int64",
+        "transaction_month_name": "string",
+        "transaction_year": "Int64",
+        "transaction_weekday": "string",
+        "transaction_timestamp": "datetime64[ns]",
+    },
+    "dim_customers": {
+        "customer_key": "Int64",
+        "customer_id": "Int64",
+        "country": "string",
+        "signup_date": "datetime64[ns]",
+        "effective_from": "datetime64[ns]",
+        "effective_to": "datetime64[ns]",
+        "is_current": "boolean",
+    },
+    "fact_transactions": {
+        "transaction_id": "Int64",
+        "transaction_key": "Int64",
+        "customer_id": "Int64",
+        "customer_key": "Int64",
+        "currency_key": "Int64",
+        "category_key": "Int64",
+        "date_key": "Int64",
+        "transaction_timestamp": "datetime64[ns]",
+        "transaction_amount_eur": "float64",
+        "current_exchange_rate": "float64",
+        "is_high_value_transaction": "Int64",
+        "transaction_year": "Int64",
+        "transaction_month": "Int64",
+    },
+    "agg_customer_metrics": {
+        "customer_id": "Int64",
+        "transaction_count": "Int64",
+        "total_spend_eur": "float64",
+        "high_value_transaction_count": "Int64",
+        "average_transaction_eur": "float64",
+    },
+    "agg_customer_category_spend": {
+        "customer_id": "Int64",
+        "category": "string",
+        "transaction_count": "Int64",
+        "total_spend_eur": "float64",
+    },
+}
+
+# Calendar attributes (as in dim_dates) used to partition time-based tables
+DATE_PARTITION_COLUMNS = ["transaction_year", "transaction_month"]
+
+# Tables stored as one directory per partition instead of a single file
+TABLE_PARTITIONS = {
+    "fact_transactions": DATE_PARTITION_COLUMNS,
+}
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """
+    Cast the columns of a gold table to the types declared in TABLE_SCHEMAS.
+    Columns without a declared type are left untouched.
+    """
+
+    schema = TABLE_SCHEMAS.get(name, {})
+    df = df.copy()
+
+    for column, dtype in schema.items():
+        if column not in df.columns:
+            continue
+        if dtype == "date":
+            df[column] = pd.to_datetime(df[column]).dt.date
+        elif dtype.startswith("datetime64"):
+            df[column] = pd.to_datetime(df[column]).astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+
+    return df
+
+
+def _apply_filters(df: pd.DataFrame, filters) -> pd.DataFrame:
+    # Evaluate pyarrow-style [(column, op, value), ...] filters in pandas
+    operators = {
+        "==": lambda col, value: col == value,
+        "=": lambda col, value: col == value,
+        "!=": lambda col, value: col != value,
+        "<": lambda col, value: col < value,
+        "<=": lambda col, value: col <= value,
+        ">": lambda col, value: col > value,
+        ">=": lambda col, value: col >= value,
+        "in": lambda col, value: col.isin(value),
+        "not in": lambda col, value: ~col.isin(value),
+    }
+
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= operators[op](df[column], value).fillna(False).astype(bool)
+
+    return df[mask]
+
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    df.to_parquet(path, index=False)
+
+
+def _read_parquet(path: Path, name: str, columns=None, filters=None) -> pd.DataFrame:
+    # Column projection and predicate pushdown are handled by pyarrow
+    return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+
+def _write_csv(df: pd.DataFrame, path: Path) -> None:
+    df.to_csv(path, index=False)
+
+
+def _read_csv(path: Path, name: str, columns=None, filters=None) -> pd.DataFrame:
+    # CSV has no pushdown: read the projected (and filtered-on) columns, then filter
+    usecols = None
+    if columns is not None:
+        filter_columns = [column for column, _, _ in filters or []]
+        usecols = list(dict.fromkeys([*columns, *filter_columns]))
+
+    df = apply_schema(pd.read_csv(path, usecols=usecols), name)
+    if filters:
+        df = _apply_filters(df, filters)
+    if columns is not None:
+        df = df[columns]
+
+    return df.reset_index(drop=True)
+
+
+# Registered storage formats: name -> (file suffix, writer, reader)
+TABLE_FORMATS = {
+    "parquet": (".parquet", _write_parquet, _read_parquet),
+    "csv": (".csv", _write_csv, _read_csv),
+}
+
+
+def register_table_format(fmt: str, suffix: str, writer, reader) -> None:
+    """
+    Register an additional storage format (e.g. Feather) for gold tables.
+    ``writer(df, path)`` persists a table, ``reader(path, name, columns, filters)`` loads it.
+    """
+    TABLE_FORMATS[fmt] = (suffix, writer, reader)
+
+
+def table_path(name: str, fmt: str | None = None, directory: Path = PROCESSED_DATA_DIR) -> Path:
+    """
+    Path of a gold table in the given storage format. Partitioned tables are
+    directories at this path, holding one sub-directory per partition.
+    """
+    suffix, _, _ = TABLE_FORMATS[fmt or TABLE_FORMAT]
+    return Path(directory) / f"{name}{suffix}"
+
+
+def table_exists(name: str, directory: Path = PROCESSED_DATA_DIR) -> bool:
+    """Whether a gold table has been persisted in any registered format."""
+    return any(table_path(name, fmt, directory).exists() for fmt in TABLE_FORMATS)
+
+
+def _partition_values(values) -> tuple:
+    # Normalize a partition key so missing values compare equal
+    return tuple(None if pd.isna(value) else int(value) for value in values)
+
+
+def _partition_dir(root: Path, partition_cols, values) -> Path:
+    # Hive-style layout: root/col=value/col=value
+    parts = [f"{col}={'null' if value is None else value}" for col, value in zip(partition_cols, values)]
+    return root.joinpath(*parts)
+
+
+def _list_partition_files(root: Path, suffix: str):
+    # Yield ({partition column: value}, file path) for every file of a partitioned table
+    for path in sorted(root.rglob(f"*{suffix}")):
+        values = {}
+        for part in path.relative_to(root).parts[:-1]:
+            column, value = part.split("=", 1)
+            values[column] = None if value == "null" else int(value)
+        yield values, path
+
+
+def _write_partition_files(df, name, fmt, root, file_name, partitions=None):
+    """
+    Write ``df`` under ``root`` split by the table's partition columns.
+    ``partitions`` lists the partitions to clear first; their old files are
+    removed even if ``df`` has no rows left for them.
+    """
+
+    suffix, writer, _ = TABLE_FORMATS[fmt]
+    partition_cols = TABLE_PARTITIONS[name]
+
+    for values in partitions or []:
+        shutil.rmtree(_partition_dir(root, partition_cols, values), ignore_errors=True)
+
+    if df.empty:
+        return
+    for values, part in df.groupby(partition_cols, sort=True, dropna=False):
+        part_dir = _partition_dir(root, partition_cols, _partition_values(values))
+        part_dir.mkdir(parents=True, exist_ok=True)
+        writer(part.drop(columns=partition_cols), part_dir / f"{file_name}{suffix}")
+        add_bytes_written(path_bytes(part_dir / f"{file_name}{suffix}"))
+
+
+def _empty_table(name: str, columns=None) -> pd.DataFrame:
+    # Typed, empty version of a gold table (e.g. when every partition was pruned)
+    schema = TABLE_SCHEMAS.get(name, {})
+    columns = columns if columns is not None else list(schema)
+    return apply_schema(pd.DataFrame({column: [] for column in columns}), name)
+
+
+def _read_partitioned(root, name, fmt, columns=None, filters=None, partition_filter=None):
+    """
+    Read a partitioned table, skipping partitions that cannot match.
+
+    Filters on partition columns and ``partition_filter`` (a predicate over the
+    {column: value} dict of a partition) prune whole directories; the other
+    filters are handed to the file reader.
+    """
+
+    suffix, _, reader = TABLE_FORMATS[fmt]
+    partition_cols = TABLE_PARTITIONS.get(name, [])
+    filters = filters or []
+    partition_filters = [f for f in filters if f[0] in partition_cols]
+    file_filters = [f for f in filters if f[0] not in partition_cols]
+    file_columns = None if columns is None else [c for c in columns if c not in partition_cols]
+
+    frames = []
+    for values, path in _list_partition_files(root, suffix):
+        if partition_filters and _apply_filters(pd.DataFrame([values]), partition_filters).empty:
+            continue
+        if partition_filter is not None and not partition_filter(values):
+            continue
+
+        part = reader(path, name, columns=file_columns, filters=file_filters or None)
+        add_bytes_read(path_bytes(path))
+        for column, value in values.items():
+            part[column] = value
+        frames.append(part)
+
+    if not frames:
+        return _empty_table(name, columns)
+
+    df = apply_schema(pd.concat(frames, ignore_index=True), name)
+    return df[columns] if columns is not None else df
+
+
+def write_table(
+    df: pd.DataFrame,
+    name: str,
+    fmt: str | None = None,
+    export_csv: bool | None = None,
+    directory: Path = PROCESSED_DATA_DIR,
+) -> Path:
+    """
+    Persist a gold table with its explicit schema.
+
+    The table is written in ``fmt`` (TABLE_FORMAT by default); ``export_csv``
+    (EXPORT_CSV by default) additionally writes a CSV copy for tools that
+    cannot read Parquet. Tables listed in TABLE_PARTITIONS are written as one
+    directory per partition, replacing the previous contents.
+    """
+
+    fmt = fmt or TABLE_FORMAT
+    export_csv = EXPORT_CSV if export_csv is None else export_csv
+    df = apply_schema(df, name)
+
+    path = table_path(name, fmt, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if name in TABLE_PARTITIONS:
+        # Build the new layout next to the old one, then swap it in
+        partial = path.with_name(f".{path.name}.partial")
+        shutil.rmtree(partial, ignore_errors=True)
+        partial.mkdir()
+        _write_partition_files(df, name, fmt, partial, "part-00000")
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+        partial.rename(path)
+    else:
+        _, writer, _ = TABLE_FORMATS[fmt]
+        writer(df, path)
+        add_bytes_written(path_bytes(path))
+
+    if export_csv and fmt != "csv":
+        _write_csv(df, table_path(name, "csv", directory))
+        add_bytes_written(path_bytes(table_path(name, "csv", directory)))
+
+    logger.info(f"Saved table '{name}' ({len(df)} rows) to {path}")
+    return path
+
+
+def write_partitions(
+    df: pd.DataFrame,
+    name: str,
+    partitions,
+    fmt: str | None = None,
+    directory: Path = PROCESSED_DATA_DIR,
+) -> Path:
+    """
+    Replace only the given partitions of a partitioned table with the rows of
+    ``df``; all other partitions are left untouched. ``partitions`` lists the
+    partition value tuples (in TABLE_PARTITIONS order) being replaced.
+    """
+
+    fmt = fmt or TABLE_FORMAT
+    partitions = [_partition_values(values) for values in partitions]
+    df = apply_schema(df, name)
+
+    path = table_path(name, fmt, directory)
+    path.mkdir(parents=True, exist_ok=True)
+    _write_partition_files(df, name, fmt, path, "part-00000", partitions=partitions)
+
+    logger.info(f"Replaced {len(partitions)} partitions of table '{name}' with {len(df)} rows")
+    return path
+
+
+def read_table(
+    name: str,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None,
+    fmt: str | None = None,
+    directory: Path = PROCESSED_DATA_DIR,
+    partition_filter=None,
+) -> pd.DataFrame:
+    """
+    Load a gold table.
+
+    ``columns`` restricts the columns read and ``filters`` takes pyarrow-style
+    predicates such as ``[("transaction_year", ">=", 2023)]``, which are pushed
+    down to the file reader where the format supports it. For partitioned
+    tables, filters on partition columns and ``partition_filter`` skip whole
+    partitions. The preferred format is tried first, then any other registered
+    format the table exists in.
+    """
+
+    preferred = fmt or TABLE_FORMAT
+    for candidate in [preferred, *[f for f in TABLE_FORMATS if f != preferred]]:
+        path = table_path(name, candidate, directory)
+        if path.is_dir():
+            return _read_partitioned(
+                path, name, candidate, columns=columns, filters=filters, partition_filter=partition_filter
+            )
+        if path.exists():
+            _, _, reader = TABLE_FORMATS[candidate]
+            add_bytes_read(path_bytes(path))
+            return reader(path, name, columns=columns, filters=filters)
+
+    raise FileNotFoundError(f"Table '{name}' not found in {directory}")
+
+
+def read_table_range(
+    name: str,
+    start=None,
+    end=None,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None,
+    timestamp_column: str = "transaction_timestamp",
+    directory: Path = PROCESSED_DATA_DIR,
+) -> pd.DataFrame:
+    """
+    Load the rows of a year/month partitioned table whose ``timestamp_column``
+    lies between ``start`` and ``end`` (inclusive, either may be None). Only
+    the partitions overlapping the range are read.
+    """
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    year_column, month_column = DATE_PARTITION_COLUMNS
+
+    def overlaps(values):
+        year, month = values.get(year_column), values.get(month_column)
+        if year is None or month is None:
+            return start is None and end is None
+        if start is not None and (year, month) < (start.year, start.month):
+            return False
+        if end is not None and (year, month) > (end.year, end.month):
+            return False
+        return True
+
+    row_filters = list(filters or [])
+    if start is not None:
+        row_filters.append((timestamp_column, ">=", start))
+    if end is not None:
+        row_filters.append((timestamp_column, "<=", end))
+
+    return read_table(
+        name,
+        columns=columns,
+        filters=row_filters or None,
+        directory=directory,
+        partition_filter=overlaps,
+    )
+
+
+def _file_rows(path: Path, fmt: str) -> int:
+    # Row count of a table file (from the footer for Parquet)
+    if fmt == "parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    with open(path) as file:
+        return max(sum(1 for _ in file) - 1, 0)
+
+
+class TableAppender:
+    """
+    Write a gold table chunk by chunk, so tables larger than memory can be
+    persisted. Use as a context manager; the table only replaces the existing
+    one once every chunk has been written.
+
+        with TableAppender("fact_transactions") as appender:
+            for chunk in chunks:
+                appender.append(chunk)
+
+    Partitioned tables get one file per chunk in each partition it touches.
+    With ``compact_rows``, rows are instead held per partition and written
+    once a partition has that many (at most 4 x ``compact_rows`` rows are
+    held in total; past that the largest partition is written early), and
+    the files left smaller are merged when the table is finished. Small
+    chunks spread over many partitions then do not leave many small files.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fmt: str | None = None,
+        export_csv: bool | None = None,
+        directory: Path = PROCESSED_DATA_DIR,
+        compact_rows: int | None = None,
+    ):
+        self.name = name
+        self.fmt = fmt or TABLE_FORMAT
+        self.export_csv = EXPORT_CSV if export_csv is None else export_csv
+        self.directory = Path(directory)
+        self.partitioned = name in TABLE_PARTITIONS
+        self.compact_rows = compact_rows if self.partitioned else None
+        self.rows = 0
+        self._chunks = 0
+        self._files = 0
+
+        # Partition values -> rows waiting to be written (compact_rows only)
+        self._buffers: dict[tuple, list[pd.DataFrame]] = {}
+        self._buffered_rows: dict[tuple, int] = {}
+
+        if self.fmt not in ("parquet", "csv"):
+            raise ValueError(f"Format '{self.fmt}' does not support appending")
+
+        # Sinks: final path -> temporary path written while appending
+        formats = [self.fmt] + (["csv"] if self.export_csv and self.fmt != "csv" else [])
+        self._paths = {
+            fmt: table_path(name, fmt, self.directory) for fmt in formats
+        }
+        self._partial_paths = {
+            fmt: path.with_name(f".{path.name}.partial") for fmt, path in self._paths.items()
+        }
+        self._parquet_writer = None
+
+    def __enter__(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.partitioned:
+            shutil.rmtree(self._partial_paths[self.fmt], ignore_errors=True)
+            self._partial_paths[self.fmt].mkdir()
+        return self
+
+    def append(self, df: pd.DataFrame) -> None:
+        df = apply_schema(df, self.name)
+
+        for fmt, path in self._partial_paths.items():
+            if fmt == self.fmt and self.compact_rows:
+                self._buffer(df)
+            elif fmt == self.fmt and self.partitioned:
+                _write_partition_files(df, self.name, fmt, path, f"part-{self._chunks:05d}")
+            elif fmt == "parquet":
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if self._parquet_writer is None:
+                    self._parquet_writer = pq.ParquetWriter(path, table.schema)
+                self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+            else:
+                df.to_csv(path, mode="a", header=self.rows == 0, index=False)
+
+        self.rows += len(df)
+        self._chunks += 1
+
+    def _buffer(self, df: pd.DataFrame) -> None:
+        for values, part in df.groupby(TABLE_PARTITIONS[self.name], sort=False, dropna=False):
+            key = _partition_values(values)
+            self._buffers.setdefault(key, []).append(part)
+            self._buffered_rows[key] = self._buffered_rows.get(key, 0) + len(part)
+            if self._buffered_rows[key] >= self.compact_rows:
+                self._flush(key)
+
+        while sum(self._buffered_rows.values()) > 4 * self.compact_rows:
+            self._flush(max(self._buffered_rows, key=self._buffered_rows.get))
+
+    def _flush(self, key: tuple) -> None:
+        # One file with the buffered rows of the partition
+        del self._buffered_rows[key]
+        _write_partition_files(
+            pd.concat(self._buffers.pop(key), ignore_index=True),
+            self.name,
+            self.fmt,
+            self._partial_paths[self.fmt],
+            f"part-{self._files:05d}",
+        )
+        self._files += 1
+
+    def _compact(self) -> None:
+        """
+        Merge the files of every partition smaller than ``compact_rows`` rows
+        into files of about that many rows, holding at most that many rows
+        in memory.
+        """
+
+        suffix, writer, reader = TABLE_FORMATS[self.fmt]
+        root = self._partial_paths[self.fmt]
+
+        for part_dir in sorted({path.parent for path in root.rglob(f"*{suffix}")}):
+            files = [
+                file for file in sorted(part_dir.glob(f"part-*{suffix}"))
+                if _file_rows(file, self.fmt) < self.compact_rows
+            ]
+            if len(files) < 2:
+                continue
+
+            pending, pending_rows, written = [], 0, 0
+            for index, file in enumerate(files):
+                pending.append(reader(file, self.name))
+                pending_rows += len(pending[-1])
+                add_bytes_read(path_bytes(file))
+                file.unlink()
+
+                if pending_rows >= self.compact_rows or index == len(files) - 1:
+                    path = part_dir / f"compacted-{written:05d}{suffix}"
+                    writer(pd.concat(pending, ignore_index=True), path)
+                    add_bytes_written(path_bytes(path))
+                    pending, pending_rows, written = [], 0, written + 1
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if exc_type is None and self.compact_rows:
+            for key in list(self._buffers):
+                self._flush(key)
+            self._compact()
+
+        for fmt, partial_path in self._partial_paths.items():
+            final_path = self._paths[fmt]
+            if exc_type is None and partial_path.exists():
+                if final_path.is_dir():
+                    shutil.rmtree(final_path)
+                elif final_path.exists():
+                    final_path.unlink()
+                partial_path.rename(final_path)
+                # Partition files were counted as they were written
+                if not (fmt == self.fmt and self.partitioned):
+                    add_bytes_written(path_bytes(final_path))
+            elif partial_path.is_dir():
+                shutil.rmtree(partial_path)
+            else:
+                partial_path.unlink(missing_ok=True)
+
+        if exc_type is None:
+            logger.info(f"Saved table '{self.name}' ({self.rows} rows) to {self._paths[self.fmt]}")
+        return False
+
+
+# =========================================
+# Incremental load watermarks
+# =========================================
+
+# High-water marks of incremental loads, per table
+WATERMARKS_PATH = PROCESSED_DATA_DIR / "_watermarks.json"
+
+
+def read_watermark(name: str, path: Path = WATERMARKS_PATH) -> pd.Timestamp | None:
+    """Latest timestamp loaded into a table, or None if it was never loaded."""
+    if not Path(path).exists():
+        return None
+
+    watermarks = json.loads(Path(path).read_text())
+    value = watermarks.get(name)
+    return pd.Timestamp(value) if value else None
+
+
+def write_watermark(name: str, value, path: Path = WATERMARKS_PATH) -> None:
+    """Record the latest timestamp loaded into a table."""
+    path = Path(path)
+    watermarks = json.loads(path.read_text()) if path.exists() else {}
+    watermarks[name] = pd.Timestamp(value).isoformat()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(watermarks, indent=2))
+    logger.info(f"Watermark for '{name}' set to {watermarks[name]}")
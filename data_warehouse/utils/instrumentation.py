@@ -0,0 +1,356 @@
+"""
+Per-stage instrumentation of the ETL.
+
+stage() (a context manager) and instrumented() (a decorator) record, for
+every run of a stage, its wall time, input and output rows, bytes read and
+written and peak memory (RSS). Stages nest: a gold builder called inside a
+pipeline stage is recorded as its child, and bytes read or written count
+towards every open stage.
+
+Finished stages are logged and appended as JSON lines to
+WAREHOUSE_METRICS_JSONL; at the end of a pipeline run (pipeline_run) the
+latest stage metrics are written as a Prometheus textfile to
+WAREHOUSE_METRICS_TEXTFILE, for node_exporter's textfile collector.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Export targets (unset: not exported), see configure()
+METRICS_JSONL_PATH = os.getenv("WAREHOUSE_METRICS_JSONL")
+METRICS_TEXTFILE_PATH = os.getenv("WAREHOUSE_METRICS_TEXTFILE")
+
+# Open stages (innermost last), the input rows of their child stages, and
+# the current pipeline run
+_active = []
+_child_rows_in = {}
+_run = None
+
+
+def configure(jsonl_path=None, textfile_path=None) -> None:
+    """Override the export targets set by the environment."""
+    global METRICS_JSONL_PATH, METRICS_TEXTFILE_PATH
+    if jsonl_path:
+        METRICS_JSONL_PATH = jsonl_path
+    if textfile_path:
+        METRICS_TEXTFILE_PATH = textfile_path
+
+
+def count_rows(output) -> int | None:
+    # Stages return either a DataFrame, a tuple of DataFrames (extract, aggregates) or a row count
+    if isinstance(output, pd.DataFrame):
+        return len(output)
+    if isinstance(output, tuple):
+        return sum(len(part) for part in output if isinstance(part, pd.DataFrame))
+    if isinstance(output, int):
+        return output
+    return None
+
+
+def path_bytes(path) -> int:
+    """Size of a file, or of every file under a directory (partitioned tables)."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def add_bytes_read(count: int) -> None:
+    for record in _active:
+        record["bytes_read"] += count
+
+
+def add_bytes_written(count: int) -> None:
+    for record in _active:
+        record["bytes_written"] += count
+
+
+def annotate(**fields) -> None:
+    """Attach extra fields (e.g. null counts) to the innermost open stage."""
+    if _active:
+        _active[-1].update(fields)
+
+
+# =========================================
+# Peak memory
+# =========================================
+
+_CLEAR_REFS = Path("/proc/self/clear_refs")
+_STATUS = Path("/proc/self/status")
+
+
+def _reset_peak() -> None:
+    # Linux can reset the RSS high-water mark (VmHWM), so each stage gets its own peak
+    try:
+        _CLEAR_REFS.write_text("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        for line in _STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # Elsewhere: peak of the whole process so far (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# =========================================
+# Stages
+# =========================================
+
+def _append_json_line(payload: dict) -> None:
+    if not METRICS_JSONL_PATH:
+        return
+    path = Path(METRICS_JSONL_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as file:
+        file.write(json.dumps(payload, default=str) + "\n")
+
+
+def _finish(record: dict, report) -> None:
+    if report is not None:
+        report.append(record)
+    if _run is not None:
+        _run["records"].append(record)
+
+    rows_in = "?" if record["rows_in"] is None else record["rows_in"]
+    rows_out = "?" if record["rows_out"] is None else record["rows_out"]
+    logger.info(
+        f"Stage '{record['path']}' {record['status']} in {record['seconds']:.2f}s: "
+        f"{rows_in} -> {rows_out} rows, {record['bytes_read']} bytes read, "
+        f"{record['bytes_written']} bytes written, peak RSS {record['peak_rss_bytes'] / 2**20:.0f} MB"
+    )
+    _append_json_line({"event": "stage", **record})
+
+
+@contextmanager
+def stage(name: str, report: list | None = None, rows_in: int | None = None):
+    """
+    Record one run of a stage. Yields its metrics dict, in which the caller
+    sets ``rows_out`` (and ``rows_in`` if not given); the finished record is
+    appended to ``report`` if given. A stage that does not count its input
+    rows gets the total input rows of its child stages.
+    """
+
+    parent = _active[-1] if _active else None
+    if parent is not None:
+        # Keep the parent's peak so far before the high-water mark is reset
+        parent["peak_rss_bytes"] = max(parent["peak_rss_bytes"], _peak_rss_bytes())
+    _reset_peak()
+
+    record = {
+        "run_id": _run["run_id"] if _run else None,
+        "pipeline": _run["pipeline"] if _run else None,
+        "stage": name,
+        "path": f"{parent['path']}/{name}" if parent else name,
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "status": "running",
+        "seconds": 0.0,
+        "rows_in": rows_in,
+        "rows_out": None,
+        "bytes_read": 0,
+        "bytes_written": 0,
+        "peak_rss_bytes": 0,
+    }
+    _active.append(record)
+    start = time.perf_counter()
+
+    try:
+        yield record
+        record["status"] = "ok"
+    except BaseException:
+        record["status"] = "error"
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        record["peak_rss_bytes"] = max(record["peak_rss_bytes"], _peak_rss_bytes())
+        _active.remove(record)
+
+        children_rows_in = _child_rows_in.pop(id(record), None)
+        if record["rows_in"] is None:
+            record["rows_in"] = children_rows_in
+
+        if parent is not None:
+            parent["peak_rss_bytes"] = max(parent["peak_rss_bytes"], record["peak_rss_bytes"])
+            if record["rows_in"] is not None:
+                _child_rows_in[id(parent)] = _child_rows_in.get(id(parent), 0) + record["rows_in"]
+        _finish(record, report)
+
+
+def run_stage(name: str, stage_fn, report: list | None = None, rows_in: int | None = None):
+    """Run ``stage_fn()`` as a stage and return its output, counting its rows."""
+    with stage(name, report, rows_in) as record:
+        output = stage_fn()
+        record["rows_out"] = count_rows(output)
+    return output
+
+
+def _count_input(value, record):
+    # DataFrames handed in count as input rows, and so do the outputs of the
+    # loader callables the gold builders take (``lambda: transactions_df``)
+    if isinstance(value, pd.DataFrame):
+        record["rows_in"] = (record["rows_in"] or 0) + len(value)
+    elif callable(value) and not isinstance(value, type):
+        loader = value
+
+        def value(*args, **kwargs):
+            output = loader(*args, **kwargs)
+            rows = count_rows(output)
+            if rows is not None:
+                record["rows_in"] = (record["rows_in"] or 0) + rows
+            return output
+
+    return value
+
+
+def instrumented(name: str | None = None):
+    """
+    Decorator recording every call of a function as a stage (named after the
+    function by default). Input rows are counted from the DataFrame and loader
+    arguments, output rows from the return value.
+    """
+
+    def decorate(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                args = [_count_input(value, record) for value in args]
+                kwargs = {key: _count_input(value, record) for key, value in kwargs.items()}
+                output = fn(*args, **kwargs)
+                record["rows_out"] = count_rows(output)
+            return output
+
+        return wrapper
+
+    return decorate
+
+
+# =========================================
+# Pipeline runs and Prometheus export
+# =========================================
+
+# Record field -> (metric name, help text)
+PROMETHEUS_METRICS = {
+    "seconds": ("warehouse_stage_duration_seconds", "Wall time of the ETL stage in the latest run."),
+    "rows_in": ("warehouse_stage_rows_in", "Rows the ETL stage received in the latest run."),
+    "rows_out": ("warehouse_stage_rows_out", "Rows the ETL stage produced in the latest run."),
+    "bytes_read": ("warehouse_stage_bytes_read", "Bytes the ETL stage read in the latest run."),
+    "bytes_written": ("warehouse_stage_bytes_written", "Bytes the ETL stage wrote in the latest run."),
+    "peak_rss_bytes": ("warehouse_stage_peak_rss_bytes", "Peak resident memory of the ETL stage in the latest run."),
+}
+
+
+def _aggregate(records) -> dict:
+    # One series per stage path: repeated calls are summed, peaks maxed
+    stages = {}
+    for record in records:
+        total = stages.setdefault(record["path"], {"status": "ok", "peak_rss_bytes": 0})
+        for field in PROMETHEUS_METRICS:
+            if record[field] is None:
+                continue
+            if field == "peak_rss_bytes":
+                total[field] = max(total[field], record[field])
+            else:
+                total[field] = total.get(field, 0) + record[field]
+        if record["status"] != "ok":
+            total["status"] = record["status"]
+    return stages
+
+
+def write_prometheus_textfile(run: dict, path) -> None:
+    """Write the stage metrics of a pipeline run in the Prometheus text format."""
+
+    pipeline = run["pipeline"]
+    stages = _aggregate(run["records"])
+    lines = []
+
+    for field, (metric, help_text) in PROMETHEUS_METRICS.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for stage_path, total in stages.items():
+            if field in total:
+                lines.append(f'{metric}{{pipeline="{pipeline}",stage="{stage_path}"}} {total[field]}')
+
+    lines += [
+        "# HELP warehouse_stage_success Whether the ETL stage succeeded in the latest run.",
+        "# TYPE warehouse_stage_success gauge",
+        *[
+            f'warehouse_stage_success{{pipeline="{pipeline}",stage="{stage_path}"}} {int(total["status"] == "ok")}'
+            for stage_path, total in stages.items()
+        ],
+        "# HELP warehouse_run_duration_seconds Wall time of the latest pipeline run.",
+        "# TYPE warehouse_run_duration_seconds gauge",
+        f'warehouse_run_duration_seconds{{pipeline="{pipeline}"}} {run["seconds"]}',
+        "# HELP warehouse_run_success Whether the latest pipeline run succeeded.",
+        "# TYPE warehouse_run_success gauge",
+        f'warehouse_run_success{{pipeline="{pipeline}"}} {int(run["status"] == "ok")}',
+        "# HELP warehouse_run_finished_timestamp_seconds When the latest pipeline run finished.",
+        "# TYPE warehouse_run_finished_timestamp_seconds gauge",
+        f'warehouse_run_finished_timestamp_seconds{{pipeline="{pipeline}"}} {run["finished"]:.0f}',
+    ]
+
+    # Write to a temporary file first so the collector never reads a partial file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.tmp")
+    temporary.write_text("\n".join(lines) + "\n")
+    os.replace(temporary, path)
+
+
+@contextmanager
+def pipeline_run(pipeline: str):
+    """
+    Group the stages of one pipeline run under a run id, and export the
+    run's metrics when it ends (also when it fails). A run started inside
+    another one (e.g. a fallback to a full load) joins the outer run.
+    """
+
+    global _run
+    if _run is not None:
+        yield _run
+        return
+
+    _run = {"run_id": uuid.uuid4().hex[:12], "pipeline": pipeline, "records": [], "status": "running"}
+    run = _run
+    start = time.perf_counter()
+
+    try:
+        yield run
+        run["status"] = "ok"
+    except BaseException:
+        run["status"] = "error"
+        raise
+    finally:
+        _run = None
+        run["seconds"] = round(time.perf_counter() - start, 3)
+        run["finished"] = time.time()
+        _append_json_line({
+            "event": "run",
+            "run_id": run["run_id"],
+            "pipeline": pipeline,
+            "status": run["status"],
+            "seconds": run["seconds"],
+            "stages": len(run["records"]),
+        })
+        if METRICS_TEXTFILE_PATH:
+            write_prometheus_textfile(run, METRICS_TEXTFILE_PATH)
@@ -0,0 +1,273 @@
+"""
+Vectorized SCD Type-2 engine.
+
+Changes are detected by comparing a row hash over the tracked attributes
+instead of merging and comparing column by column, and an upsert only
+materializes the rows that change: the current versions to expire and the
+new versions to insert. Staging data may hold several snapshots per business
+key (one per change date), which become a chain of versions in one run.
+
+point_in_time_join attaches to each fact the dimension version valid at the
+fact's date with a sorted as-of lookup, instead of merging every version of
+the key and filtering on the validity range.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.helper_functions import logger
+
+# Technical columns maintained by the engine
+SCD2_COLUMNS = ["effective_from", "effective_to", "is_current"]
+
+# Change date and staging position of each snapshot while an upsert is computed
+_CHANGE_DATE = "_scd2_change_date"
+_ROW = "_scd2_row"
+
+
+def _canonical(column: pd.Series) -> pd.Series:
+    # Render values the same way whatever their dtype (object, string, categorical, datetime)
+    # (string-like columns already hash by value, so they are not copied unless they hold nulls)
+    if pd.api.types.is_datetime64_any_dtype(column):
+        column = column.dt.strftime("%Y-%m-%dT%H:%M:%S")
+    elif not (
+        pd.api.types.is_object_dtype(column)
+        or pd.api.types.is_string_dtype(column)
+        or isinstance(column.dtype, pd.CategoricalDtype)
+    ):
+        column = column.astype("string")
+    return column.astype(object).fillna("") if column.hasnans else column
+
+
+def row_hash(df: pd.DataFrame, tracked_columns) -> np.ndarray:
+    """64-bit hash of the tracked attributes of every row."""
+    canonical = pd.DataFrame({column: _canonical(df[column]) for column in tracked_columns})
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+
+def scd2_changes(
+    dim: pd.DataFrame,
+    staging: pd.DataFrame,
+    business_key: str,
+    surrogate_key: str,
+    tracked_columns,
+    run_date: pd.Timestamp | None = None,
+    change_date_column: str | None = None,
+):
+    """
+    Compute the SCD2 delta of ``staging`` against the current rows of ``dim``.
+
+    Each staging row is a snapshot of one business key at its change date
+    (``change_date_column``, or ``run_date`` for every row). Snapshots whose
+    tracked attributes hash the same as the previous version of the key are
+    dropped; the others become new versions, each valid until the next one.
+
+    Returns ``(expired, inserts)``: the surrogate keys of current rows to close
+    with their new ``effective_to``, and the new version rows with surrogate
+    keys continuing after the dimension's highest key.
+    """
+
+    run_date = run_date or pd.Timestamp.today().normalize()
+    attribute_columns = [
+        column for column in dim.columns
+        if column not in SCD2_COLUMNS and column != surrogate_key and column in staging.columns
+    ]
+
+    # One snapshot per business key and change date, grouped by key in time order
+    snapshots = staging[attribute_columns].copy()
+    snapshots[_CHANGE_DATE] = (
+        pd.to_datetime(staging[change_date_column]) if change_date_column else run_date
+    )
+    snapshots = snapshots.drop_duplicates(subset=[business_key, _CHANGE_DATE], keep="first")
+    snapshots[_ROW] = np.arange(len(snapshots))
+    snapshots = snapshots.sort_values([business_key, _CHANGE_DATE], kind="stable").reset_index(drop=True)
+
+    # Current version of every business key (get_indexer requires them unique)
+    current = dim.loc[dim["is_current"].astype(bool), [surrogate_key, business_key, *tracked_columns]]
+    current_index = pd.Index(current[business_key])
+    current_hash = row_hash(current, tracked_columns)
+
+    # Compare every snapshot with the version before it: the previous snapshot
+    # of the same key, or the current dimension row for the first one
+    snapshot_hash = row_hash(snapshots, tracked_columns)
+    keys = snapshots[business_key]
+    is_first = keys.ne(keys.shift()).to_numpy(dtype=bool, na_value=True)
+
+    previous_hash = np.empty_like(snapshot_hash)
+    previous_hash[1:] = snapshot_hash[:-1]
+    has_previous = ~is_first
+
+    first_rows = np.flatnonzero(is_first)
+    in_current = current_index.get_indexer(keys.iloc[first_rows])
+    found = in_current >= 0
+    previous_hash[first_rows[found]] = current_hash[in_current[found]]
+    has_previous[first_rows[found]] = True
+
+    is_change = ~has_previous | (snapshot_hash != previous_hash)
+    inserts = snapshots[is_change].reset_index(drop=True)
+
+    # Chain the new versions of each key: each is valid until the next one
+    next_from = inserts.groupby(business_key, sort=False)[_CHANGE_DATE].shift(-1)
+    inserts["effective_from"] = inserts[_CHANGE_DATE]
+    inserts["effective_to"] = next_from
+    inserts["is_current"] = next_from.isna()
+
+    # Surrogate keys follow change date, then staging order
+    inserts = inserts.sort_values([_CHANGE_DATE, _ROW], kind="stable").reset_index(drop=True)
+    next_key = int(dim[surrogate_key].max()) + 1 if len(dim) else 1
+    inserts[surrogate_key] = np.arange(next_key, next_key + len(inserts))
+    inserts = inserts[[surrogate_key, *attribute_columns, *SCD2_COLUMNS]]
+
+    # Current rows superseded by the first new version of their key
+    first_versions = inserts.drop_duplicates(subset=[business_key], keep="first")
+    superseded = current_index.get_indexer(first_versions[business_key])
+    found = superseded >= 0
+    expired = pd.DataFrame({
+        surrogate_key: current[surrogate_key].to_numpy()[superseded[found]],
+        "effective_to": first_versions["effective_from"].to_numpy()[found],
+    })
+
+    logger.info(
+        f"SCD2: {len(snapshots)} staging snapshots -> {len(expired)} versions expired, "
+        f"{len(inserts)} versions inserted"
+    )
+    return expired, inserts
+
+
+def apply_scd2_changes(
+    dim: pd.DataFrame,
+    expired: pd.DataFrame,
+    inserts: pd.DataFrame,
+    surrogate_key: str,
+) -> pd.DataFrame:
+    """
+    Apply an SCD2 delta: append the inserted versions and close the expired
+    rows (located by position through the surrogate key). Returns a new
+    frame; ``dim`` itself is left unchanged.
+    """
+
+    positions = pd.Index(dim[surrogate_key]).get_indexer(expired[surrogate_key])
+    if (positions < 0).any():
+        raise KeyError("Expired surrogate keys are missing from the dimension")
+
+    # The existing rows keep their positions at the start of the result, which
+    # is the only copy of the dimension made
+    if inserts.empty:
+        result = dim.reset_index(drop=True).copy()
+    else:
+        result = pd.concat([dim, inserts[dim.columns]], ignore_index=True)
+
+    if not expired.empty:
+        result.iloc[positions, result.columns.get_loc("effective_to")] = expired["effective_to"].to_numpy()
+        result.iloc[positions, result.columns.get_loc("is_current")] = False
+
+    return result
+
+
+def version_positions(
+    dim: pd.DataFrame,
+    keys: pd.Series,
+    dates: pd.Series,
+    business_key: str,
+    effective_from: str = "effective_from",
+    effective_to: str = "effective_to",
+) -> np.ndarray:
+    """
+    Row position in ``dim`` of the version of each key valid at each date,
+    or -1 where no version covers it (unknown key, date before the first
+    version or after the end of an expired one).
+
+    The latest version starting at or before the date is found with a
+    sorted as-of lookup, so memory stays linear in the number of lookups
+    however many versions a key has.
+    """
+
+    positions = np.full(len(keys), -1, dtype="int64")
+
+    lookups = pd.DataFrame({
+        "_date": pd.to_datetime(pd.Series(dates).to_numpy()).astype("datetime64[ns]"),
+        "_key": pd.Series(keys).reset_index(drop=True),
+        "_lookup": np.arange(len(keys)),
+    }).dropna(subset=["_date", "_key"])
+
+    versions = pd.DataFrame({
+        "_from": pd.to_datetime(dim[effective_from]).astype("datetime64[ns]").to_numpy(),
+        "_key": dim[business_key].reset_index(drop=True),
+        "_position": np.arange(len(dim)),
+    }).dropna(subset=["_from", "_key"])
+
+    if lookups.empty or versions.empty:
+        return positions
+
+    # Align the key dtypes so the by-key match compares like with like
+    key_dtype = dim[business_key].dtype
+    lookups["_key"] = lookups["_key"].astype(key_dtype)
+    versions["_key"] = versions["_key"].astype(key_dtype)
+
+    matched = pd.merge_asof(
+        lookups.sort_values("_date", kind="stable"),
+        versions.sort_values("_from", kind="stable"),
+        left_on="_date",
+        right_on="_from",
+        by="_key",
+        direction="backward",
+    ).dropna(subset=["_position"])
+
+    # The version found must not have ended before the date
+    ends = pd.to_datetime(dim[effective_to]).astype("datetime64[ns]").to_numpy()
+    found = matched["_position"].to_numpy(dtype="int64")
+    valid_to = ends[found]
+    valid = np.isnat(valid_to) | (matched["_date"].to_numpy() <= valid_to)
+
+    positions[matched["_lookup"].to_numpy()[valid]] = found[valid]
+    return positions
+
+
+def point_in_time_join(
+    facts: pd.DataFrame,
+    dim: pd.DataFrame,
+    business_key: str,
+    date_column: str,
+    columns=None,
+    how: str = "inner",
+    suffixes=("_x", "_y"),
+    effective_from: str = "effective_from",
+    effective_to: str = "effective_to",
+) -> pd.DataFrame:
+    """
+    Attach to every fact the ``dim`` version of its ``business_key`` valid at
+    ``date_column``: the SCD2 equivalent of merging on the key and filtering
+    ``effective_from <= date <= effective_to``, without materializing every
+    fact x version pair. A version starting on the date wins over the one
+    ending on it.
+
+    ``columns`` limits the dimension columns attached (default: all).
+    ``how="left"`` keeps unmatched facts with missing dimension values.
+    Overlapping column names get ``suffixes`` as in ``DataFrame.merge``.
+    """
+
+    positions = version_positions(
+        dim, facts[business_key], facts[date_column], business_key,
+        effective_from=effective_from, effective_to=effective_to,
+    )
+
+    if how == "inner":
+        matched = positions >= 0
+        facts = facts[matched]
+        positions = positions[matched]
+    elif how != "left":
+        raise ValueError(f"Unsupported point-in-time join: {how}")
+
+    # Position -1 is absent from the RangeIndex, so unmatched facts get nulls
+    columns = [column for column in (columns or dim.columns) if column != business_key]
+    versions = dim[columns].reset_index(drop=True).reindex(positions)
+
+    overlap = set(columns) & set(facts.columns)
+    versions.index = facts.index
+    return pd.concat(
+        [
+            facts.rename(columns={column: column + suffixes[0] for column in overlap}),
+            versions.rename(columns={column: column + suffixes[1] for column in overlap}),
+        ],
+        axis=1,
+    )
@@ -9,11 +9,12 @@ type Message = {
 type ChatMessagesProps = {
   messages: Message[];
   loading: boolean;
+  status?: string;
   bottomRef: React.RefObject<HTMLDivElement>;
 };
 
 /** Displays chat messages, welcome message, and loading state */
-export default function ChatMessages({ messages, loading, bottomRef }: ChatMessagesProps) {
+export default function ChatMessages({ messages, loading, status, bottomRef }: ChatMessagesProps) {
   return (
     <div className="flex-1 overflow-y-auto p-6 space-y-4">
       
@@ -42,8 +43,10 @@ export default function ChatMessages({ messages, loading, bottomRef }: ChatMessa
         </div>
       ))}
 
-      {/* Loading indicator */}
-      {loading && <div className="text-slate-500 text-sm">Agent is thinking…</div>}
+      {/* Loading indicator and tool-call progress */}
+      {(loading || status) && (
+        <div className="text-slate-500 text-sm">{status || "Agent is thinking…"}</div>
+      )}
 
       {/* Scroll anchor */}
       <div ref={bottomRef} />
@@ -21,11 +21,12 @@ export default function Home() {
   const [messages, setMessages] = useState<Message[]>([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [status, setStatus] = useState("");
 
   // Ref for scrolling to bottom, can be null initially
   const bottomRef = useRef<HTMLDivElement>(null);
 
-  const API_URL = "http://localhost:8000/chat";
+  const API_URL = "http://localhost:8000/chat/stream";
 
   // Initialize session ID in localStorage if not present
   useEffect(() => {
@@ -63,20 +64,49 @@ export default function Home() {
         }),
       });
 
-      const data: { response: string; session_id?: string } = await res.json();
-
-      // Store new session ID if provided
-      if (data.session_id) {
-        localStorage.setItem("session_id", data.session_id);
+      if (!res.body) throw new Error("Streaming is not supported by this browser.");
+
+      // Read the server-sent events as they arrive
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let answer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}");
+
+          if (event === "session") {
+            // Store new session ID
+            localStorage.setItem("session_id", data.session_id);
+          } else if (event === "tool_start") {
+            setStatus(`Running ${data.name}…`);
+          } else if (event === "tool_end") {
+            setStatus("");
+          } else if (event === "token" || event === "done") {
+            // Grow the agent message token by token
+            answer = event === "done" ? data.response : answer + data.content;
+            const agentMessage: Message = { role: "agent", content: answer };
+            setMessages([...newMessages, agentMessage]);
+            setLoading(false);
+          } else if (event === "error") {
+            console.error("Agent error:", data.detail);
+          }
+        }
       }
-
-      // Add agent message, typecast role as literal
-      const agentMessage: Message = { role: "agent", content: data.response };
-      setMessages([...newMessages, agentMessage]);
     } catch (error) {
       console.error("Error sending message:", error);
     } finally {
       setLoading(false);
+      setStatus("");
     }
   };
 
@@ -84,7 +114,7 @@ export default function Home() {
     <main className="flex h-screen items-center justify-center">
       <div className="w-full max-w-3xl h-[90vh] bg-slate-900/70 rounded-2xl shadow-2xl flex flex-col">
         <ChatHeader />
-        <ChatMessages messages={messages} loading={loading} bottomRef={bottomRef} />
+        <ChatMessages messages={messages} loading={loading} status={status} bottomRef={bottomRef} />
         <ChatInput input={input} setInput={setInput} sendMessage={sendMessage} />
       </div>
     </main>